@@ -0,0 +1,107 @@
+from django.core.exceptions import ObjectDoesNotExist
+
+
+class BadRequest(ValueError):
+    """Неверные параметры запроса к API."""
+
+
+class Serializer:
+    """Превращает объект в словарь из выбранных полей.
+
+    fields — имя поля в ответе и функция, которая достаёт значение;
+    related — связи для select_related, нужные полю. Клиент выбирает
+    поля параметром ?fields=id,text, и ненужные связи не загружаются.
+    """
+
+    fields = {}
+    related = {}
+
+    def __init__(self, names=None):
+        if names:
+            names = [name.strip() for name in names.split(',')]
+            unknown = [name for name in names if name not in self.fields]
+            if unknown:
+                raise BadRequest(
+                    'Неизвестные поля: ' + ', '.join(unknown)
+                )
+            self.names = list(dict.fromkeys(names))
+        else:
+            self.names = list(self.fields)
+
+    def prepare(self, queryset):
+        related = dict.fromkeys(
+            self.related[name] for name in self.names if name in self.related
+        )
+        return queryset.select_related(*related) if related else queryset
+
+    def to_dict(self, obj):
+        return {name: self.fields[name](obj) for name in self.names}
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': lambda post: post.pk,
+        'text': lambda post: post.text,
+        'pub_date': lambda post: post.pub_date,
+        'author': lambda post: post.author.username,
+        'group': lambda post: post.group.slug if post.group_id else None,
+        'image': lambda post: post.image.url if post.image else None,
+        'comments_count': lambda post: post.comments_count,
+    }
+    related = {'author': 'author', 'group': 'group'}
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': lambda comment: comment.pk,
+        'post': lambda comment: comment.post_id,
+        'author': lambda comment: comment.author.username,
+        'text': lambda comment: comment.text,
+        'created': lambda comment: comment.created,
+    }
+    related = {'author': 'author'}
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': lambda group: group.pk,
+        'title': lambda group: group.title,
+        'slug': lambda group: group.slug,
+        'description': lambda group: group.description,
+        'posts_count': lambda group: group.posts_count,
+    }
+
+
+def author_stat(name):
+    """Счётчик из AuthorStats; у пользователя без строки счётчиков — 0."""
+    def get(user):
+        try:
+            return getattr(user.stats, name)
+        except ObjectDoesNotExist:
+            return 0
+    return get
+
+
+class ProfileSerializer(Serializer):
+    fields = {
+        'username': lambda user: user.username,
+        'first_name': lambda user: user.first_name,
+        'last_name': lambda user: user.last_name,
+        'posts_count': author_stat('posts_count'),
+        'followers_count': author_stat('followers_count'),
+        'following_count': author_stat('following_count'),
+    }
+    related = {
+        'posts_count': 'stats',
+        'followers_count': 'stats',
+        'following_count': 'stats',
+    }
+
+
+class FollowSerializer(Serializer):
+    fields = {
+        'id': lambda follow: follow.pk,
+        'user': lambda follow: follow.user.username,
+        'author': lambda follow: follow.author.username,
+    }
+    related = {'user': 'user', 'author': 'author'}
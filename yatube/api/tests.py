@@ -0,0 +1,120 @@
+import json
+import warnings
+from http import HTTPStatus
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+from posts.paginators import FORWARD, encode_cursor
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Nobody')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовый description',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Тестовый текст {i}', author=cls.user, group=cls.group
+            )
+            for i in range(5)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def get_json(self, url, client=None, **params):
+        response = (client or self.client).get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        return response.status_code, json.loads(content)
+
+    def test_post_list_cursor_pagination(self):
+        url = reverse('api:post_list')
+        status, data = self.get_json(url, limit=2)
+        self.assertEqual(status, HTTPStatus.OK)
+        ids = [post['id'] for post in data['results']]
+        cursor = data['next']
+        while cursor:
+            status, data = self.get_json(url, limit=2, cursor=cursor)
+            ids += [post['id'] for post in data['results']]
+            cursor = data['next']
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+
+    def test_sparse_fields_skip_joins(self):
+        url = reverse('api:post_list')
+        with CaptureQueriesContext(connection) as queries:
+            status, data = self.get_json(url, fields='id,text')
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+        with CaptureQueriesContext(connection) as queries:
+            status, data = self.get_json(url, fields='id,author,group')
+        self.assertEqual(data['results'][0]['author'], 'Nobody')
+        self.assertEqual(len(queries), 1)
+
+    def test_bad_parameters(self):
+        url = reverse('api:post_list')
+        out_of_range = encode_cursor(
+            FORWARD, '2020-01-01T00:00:00+00:00', 10 ** 30, 2
+        )
+        for params in ({'fields': 'id,password'}, {'limit': '0'},
+                       {'limit': '1000'}, {'cursor': 'garbage'},
+                       {'cursor': out_of_range}):
+            with self.subTest(params=params):
+                status, data = self.get_json(url, **params)
+                self.assertEqual(status, HTTPStatus.BAD_REQUEST)
+                self.assertIn('detail', data)
+
+    def test_details(self):
+        urls = {
+            reverse('api:post_detail', args=[self.posts[0].pk]): 'text',
+            reverse('api:group_detail', args=[self.group.slug]): 'title',
+            reverse('api:profile_detail', args=['Nobody']): 'posts_count',
+        }
+        for url, field in urls.items():
+            with self.subTest(url=url):
+                status, data = self.get_json(url)
+                self.assertEqual(status, HTTPStatus.OK)
+                self.assertIn(field, data)
+        status, data = self.get_json(reverse('api:post_detail', args=[0]))
+        self.assertEqual(status, HTTPStatus.NOT_FOUND)
+
+    def test_profile_without_stats(self):
+        AuthorStats.objects.filter(user=self.reader).delete()
+        status, data = self.get_json(
+            reverse('api:profile_detail', args=['reader'])
+        )
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertEqual(data['posts_count'], 0)
+        self.assertEqual(data['following_count'], 0)
+
+    def test_comments_and_follows(self):
+        status, data = self.get_json(
+            reverse('api:comment_list', args=[self.posts[0].pk])
+        )
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+        url = reverse('api:follow_list')
+        status, data = self.get_json(url)
+        self.assertEqual(status, HTTPStatus.UNAUTHORIZED)
+        client = Client()
+        client.force_login(self.reader)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            status, data = self.get_json(url, client)
+        self.assertEqual(data['results'], [
+            {'id': Follow.objects.get().pk, 'user': 'reader',
+             'author': 'Nobody'},
+        ])
@@ -0,0 +1,148 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from posts.models import Follow, Group, Post, User
+from posts.paginators import CursorPaginator, IdCursorPaginator
+from yatube.settings import COMMENTS_NUMBER, POSTS_NUMBER
+
+from .serializers import (
+    BadRequest, CommentSerializer, FollowSerializer, GroupSerializer,
+    PostSerializer, ProfileSerializer
+)
+
+
+def dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def api_view(view):
+    """GET/HEAD-обработчик API: ошибки отдаются в JSON, а не страницей."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'detail': 'Не найдено.'}, status=404)
+        except BadRequest as error:
+            return JsonResponse({'detail': str(error)}, status=400)
+    return wrapper
+
+
+def get_limit(request, default):
+    limit = request.GET.get('limit')
+    if limit is None:
+        return default
+    if not limit.isdigit() or not 0 < int(limit) <= settings.API_MAX_LIMIT:
+        raise BadRequest(
+            f'limit — число от 1 до {settings.API_MAX_LIMIT}.'
+        )
+    return int(limit)
+
+
+def stream_page(page, serializer):
+    """Отдаёт страницу по одному объекту, не собирая общий словарь."""
+    yield '{"results": ['
+    for number, obj in enumerate(page):
+        if number:
+            yield ','
+        yield dumps(serializer.to_dict(obj))
+    yield '], "next": {}, "previous": {}}}'.format(
+        dumps(page.next_cursor), dumps(page.previous_cursor)
+    )
+
+
+def list_response(request, paginator, serializer):
+    cursor = request.GET.get('cursor')
+    if cursor and paginator.read_cursor(cursor) is None:
+        raise BadRequest('Неверный cursor: возьмите его из next или previous.')
+    page = paginator.get_page(cursor)
+    return StreamingHttpResponse(
+        stream_page(page, serializer), content_type='application/json'
+    )
+
+
+def detail_response(obj, serializer):
+    return JsonResponse(
+        serializer.to_dict(obj), json_dumps_params={'ensure_ascii': False}
+    )
+
+
+@api_view
+def post_list(request):
+    serializer = PostSerializer(request.GET.get('fields'))
+    posts = Post.objects.all()
+    if 'group' in request.GET:
+        posts = posts.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        posts = posts.filter(author__username=request.GET['author'])
+    paginator = CursorPaginator(
+        serializer.prepare(posts), get_limit(request, POSTS_NUMBER)
+    )
+    return list_response(request, paginator, serializer)
+
+
+@api_view
+def post_detail(request, post_id):
+    serializer = PostSerializer(request.GET.get('fields'))
+    post = get_object_or_404(serializer.prepare(Post.objects), pk=post_id)
+    return detail_response(post, serializer)
+
+
+@api_view
+def comment_list(request, post_id):
+    serializer = CommentSerializer(request.GET.get('fields'))
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    paginator = CursorPaginator(
+        serializer.prepare(post.comments.all()),
+        get_limit(request, COMMENTS_NUMBER),
+        keys=('created', 'id'),
+        date_attr='created',
+        descending=False,
+    )
+    return list_response(request, paginator, serializer)
+
+
+@api_view
+def group_list(request):
+    serializer = GroupSerializer(request.GET.get('fields'))
+    paginator = IdCursorPaginator(
+        Group.objects.all(), get_limit(request, POSTS_NUMBER)
+    )
+    return list_response(request, paginator, serializer)
+
+
+@api_view
+def group_detail(request, slug):
+    serializer = GroupSerializer(request.GET.get('fields'))
+    return detail_response(get_object_or_404(Group, slug=slug), serializer)
+
+
+@api_view
+def profile_detail(request, username):
+    serializer = ProfileSerializer(request.GET.get('fields'))
+    user = get_object_or_404(
+        serializer.prepare(User.objects), username=username
+    )
+    return detail_response(user, serializer)
+
+
+@api_view
+def follow_list(request):
+    """Подписки текущего пользователя."""
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Требуется авторизация.'}, status=401
+        )
+    serializer = FollowSerializer(request.GET.get('fields'))
+    paginator = IdCursorPaginator(
+        serializer.prepare(Follow.objects.filter(user=request.user)),
+        get_limit(request, POSTS_NUMBER),
+    )
+    return list_response(request, paginator, serializer)
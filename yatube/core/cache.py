@@ -0,0 +1,62 @@
+from django.utils.module_loading import import_string
+
+from . import metrics, tracing
+
+_MISSING = object()
+
+
+class InstrumentedCache:
+    """Обёртка над бэкендом кэша для метрик и трассировки.
+
+    Считает попадания и промахи и открывает интервал трассы на каждое
+    обращение.
+
+    Настоящий бэкенд указывается в CACHES ключом WRAPPED_BACKEND,
+    остальные параметры передаются ему без изменений.
+    """
+
+    def __init__(self, location, params):
+        params = dict(params)
+        backend = import_string(params.pop('WRAPPED_BACKEND'))
+        self._backend = backend(location, params)
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+    def __contains__(self, key):
+        return self._backend.has_key(key)
+
+    def get(self, key, default=None, version=None):
+        with tracing.span('cache.get', **{'cache.key': key}) as span:
+            value = self._backend.get(key, _MISSING, version=version)
+            hit = value is not _MISSING
+            if span is not None:
+                span['attributes']['cache.hit'] = hit
+        metrics.count_cache(int(hit), int(not hit))
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        attributes = {'cache.keys': len(keys)}
+        with tracing.span('cache.get_many', **attributes) as span:
+            values = self._backend.get_many(keys, version=version)
+            if span is not None:
+                span['attributes']['cache.hits'] = len(values)
+        metrics.count_cache(len(values), len(keys) - len(values))
+        return values
+
+    def set(self, key, *args, **kwargs):
+        with tracing.span('cache.set', **{'cache.key': key}):
+            return self._backend.set(key, *args, **kwargs)
+
+    def set_many(self, data, *args, **kwargs):
+        with tracing.span('cache.set_many', **{'cache.keys': len(data)}):
+            return self._backend.set_many(data, *args, **kwargs)
+
+    def delete(self, key, *args, **kwargs):
+        with tracing.span('cache.delete', **{'cache.key': key}):
+            return self._backend.delete(key, *args, **kwargs)
+
+    def incr(self, key, *args, **kwargs):
+        with tracing.span('cache.incr', **{'cache.key': key}):
+            return self._backend.incr(key, *args, **kwargs)
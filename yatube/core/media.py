@@ -0,0 +1,176 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """Часть открытого файла для FileResponse.
+
+    fileno() и позиция в файле остаются настоящими, поэтому
+    wsgi.file_wrapper сервера (например, gunicorn) отдаёт диапазон через
+    sendfile без копирования в Python; без него read() не выходит за
+    границу диапазона.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def resolve(path):
+    """Абсолютный путь файла внутри MEDIA_ROOT или Http404."""
+    parts = path.split('/')
+    if any(not part or part.startswith('.') for part in parts) or (
+        '\x00' in path
+    ):
+        raise Http404
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    try:
+        full_path = os.path.realpath(safe_join(root, *parts))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not full_path.startswith(root + os.sep) or not os.path.isfile(
+        full_path
+    ):
+        raise Http404
+    return full_path
+
+
+def parse_range(header, size):
+    """(start, length) для одного диапазона bytes=, None — весь файл.
+
+    Несколько диапазонов не поддерживаются: по RFC 7233 на них можно
+    ответить всем файлом. Невыполнимый диапазон — ValueError.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = min(int(last), size)
+        if not length:
+            raise ValueError(header)
+        return size - length, length
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end - start + 1
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Для диапазонов подходит только сильное сравнение.
+        return parse_etags(if_range) == [etag]
+    return parse_http_date_safe(if_range) == last_modified
+
+
+@require_safe
+def serve(request, path):
+    """Отдаёт файл из MEDIA_ROOT.
+
+    Ответ несёт сильный ETag и Last-Modified, повторный запрос
+    с If-None-Match получает 304, поддерживаются запросы Range. При
+    MEDIA_SENDFILE_HEADER сам файл отдаёт фронтовой сервер
+    (X-Sendfile у Apache/lighttpd, X-Accel-Redirect у nginx).
+    """
+    full_path = resolve(path)
+    stat = os.stat(full_path)
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{size:x}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Accept-Ranges': 'bytes',
+    }
+    content_type = (
+        mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    )
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    sendfile_header = settings.MEDIA_SENDFILE_HEADER
+    if sendfile_header:
+        # Range и передачу файла берёт на себя фронтовой сервер.
+        response = HttpResponse(content_type=content_type)
+        if sendfile_header == 'X-Accel-Redirect':
+            response[sendfile_header] = (
+                settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+            )
+        else:
+            response[sendfile_header] = full_path
+    else:
+        response = file_response(request, full_path, size, content_type,
+                                 etag, last_modified)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def file_response(request, full_path, size, content_type, etag,
+                  last_modified):
+    file_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and if_range_matches(request, etag, last_modified):
+        try:
+            file_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+        return response
+    file = open(full_path, 'rb')
+    if file_range is None:
+        return FileResponse(file, content_type=content_type)
+    start, length = file_range
+    response = FileResponse(
+        FileRange(file, start, length), content_type=content_type,
+        status=206,
+    )
+    response['Content-Length'] = length
+    response['Content-Range'] = f'bytes {start}-{start + length - 1}/{size}'
+    return response
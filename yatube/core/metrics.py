@@ -0,0 +1,304 @@
+import glob
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+# Семейства метрик в порядке вывода: тип и описание для Prometheus
+FAMILIES = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа по имени маршрута',
+    ),
+    'yatube_responses_total': ('counter', 'Ответы по маршруту и статусу'),
+    'yatube_db_queries_total': ('counter', 'Запросы к базе по маршруту'),
+    'yatube_db_query_seconds_total': (
+        'counter', 'Время запросов к базе по маршруту',
+    ),
+    'yatube_template_render_seconds_total': (
+        'counter', 'Время рендера шаблонов по маршруту',
+    ),
+    'yatube_cache_requests_total': (
+        'counter', 'Чтения кэша по маршруту: попадания и промахи',
+    ),
+}
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+UNMATCHED = '<unmatched>'
+
+# Счётчики текущего запроса; их пополняют обёртки базы, кэша и шаблонов
+_current = ContextVar('request_stats', default=None)
+
+# Агрегаты процесса: у каждого потока свой словарь, поэтому запись идёт
+# без блокировок, а чтение копирует словари целиком (copy() под GIL).
+# Словарь завершившегося потока переносится в _retired, иначе при
+# потоке на соединение (runserver) список рос бы без конца.
+_local = threading.local()
+_aggregates = []
+_retired = defaultdict(float)
+_lock = threading.RLock()
+_last_flush = 0
+
+
+def _reset_after_fork():
+    global _local, _aggregates, _retired, _lock, _last_flush
+    _local = threading.local()
+    _aggregates = []
+    _retired = defaultdict(float)
+    _lock = threading.RLock()
+    _last_flush = 0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class RequestStats:
+    """Что потратил один запрос помимо собственного кода view."""
+
+    __slots__ = (
+        'request', 'queries', 'db_time', 'template_time', 'template_depth',
+        'cache_hits', 'cache_misses',
+    )
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def start_request(request):
+    return _current.set(RequestStats(request))
+
+
+def finish_request(token):
+    stats = _current.get()
+    _current.reset(token)
+    return stats
+
+
+def current():
+    """Счётчики текущего запроса или None вне запроса."""
+    return _current.get()
+
+
+def count_query(execute, sql, params, many, context):
+    """Обёртка connection.execute_wrapper: число и время запросов."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+
+
+def count_cache(hits, misses):
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class _Owner:
+    """Хранится только в threading.local и умирает вместе с потоком."""
+
+    __slots__ = ('aggregate', '__weakref__')
+
+
+def _retire(aggregate):
+    with _lock:
+        if not any(item is aggregate for item in _aggregates):
+            # Поток родителя до fork: его счётчики уже сброшены.
+            return
+        for key, value in aggregate.items():
+            _retired[key] += value
+        _aggregates[:] = [
+            item for item in _aggregates if item is not aggregate
+        ]
+
+
+def _aggregate():
+    owner = getattr(_local, 'owner', None)
+    if owner is None:
+        owner = _local.owner = _Owner()
+        owner.aggregate = defaultdict(float)
+        with _lock:
+            _aggregates.append(owner.aggregate)
+        weakref.finalize(owner, _retire, owner.aggregate)
+    return owner.aggregate
+
+
+def _format_le(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def record(view, status, duration, stats):
+    """Добавляет завершённый запрос в агрегат текущего потока."""
+    aggregate = _aggregate()
+    labels = (('view', view),)
+    family = 'yatube_request_duration_seconds'
+    for bound in (*settings.METRICS_BUCKETS, float('inf')):
+        if duration <= bound:
+            aggregate[
+                family, '_bucket', labels + (('le', _format_le(bound)),)
+            ] += 1
+    aggregate[family, '_sum', labels] += duration
+    aggregate[family, '_count', labels] += 1
+    aggregate[
+        'yatube_responses_total', '', labels + (('status', str(status)),)
+    ] += 1
+    aggregate['yatube_db_queries_total', '', labels] += stats.queries
+    aggregate['yatube_db_query_seconds_total', '', labels] += stats.db_time
+    aggregate[
+        'yatube_template_render_seconds_total', '', labels
+    ] += stats.template_time
+    family = 'yatube_cache_requests_total'
+    aggregate[family, '', labels + (('result', 'hit'),)] += stats.cache_hits
+    aggregate[family, '', labels + (('result', 'miss'),)] += (
+        stats.cache_misses
+    )
+    _maybe_flush()
+
+
+def snapshot():
+    """Сумма агрегатов всех потоков процесса, живых и завершившихся."""
+    with _lock:
+        total = defaultdict(float, _retired)
+        for aggregate in list(_aggregates):
+            for key, value in aggregate.copy().items():
+                total[key] += value
+    return total
+
+
+def _path(pid):
+    return os.path.join(settings.METRICS_DIR, f'{pid}.json')
+
+
+def flush():
+    """Записывает снимок процесса в METRICS_DIR/<pid>.json.
+
+    Файл заменяется атомарно, поэтому читатель не увидит его
+    наполовину записанным.
+    """
+    global _last_flush
+    _last_flush = time.monotonic()
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    rows = [
+        [family, suffix, labels, value]
+        for (family, suffix, labels), value in snapshot().items()
+    ]
+    descriptor, temp_path = tempfile.mkstemp(
+        dir=settings.METRICS_DIR, suffix='.tmp'
+    )
+    with os.fdopen(descriptor, 'w') as temp:
+        json.dump(rows, temp)
+    os.replace(temp_path, _path(os.getpid()))
+
+
+def _maybe_flush():
+    if settings.METRICS_DIR is None:
+        return
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def collect():
+    """Метрики всех процессов: свой снимок плюс файлы остальных.
+
+    Файлы завершившихся процессов остаются и продолжают учитываться,
+    поэтому счётчики не уменьшаются при перезапуске воркера; каталог
+    очищается при деплое.
+    """
+    total = snapshot()
+    if settings.METRICS_DIR is None:
+        return total
+    own = _path(os.getpid())
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        if path == own:
+            continue
+        try:
+            with open(path) as source:
+                rows = json.load(source)
+        except (OSError, ValueError):
+            continue
+        for family, suffix, labels, value in rows:
+            labels = tuple(tuple(pair) for pair in labels)
+            total[family, suffix, labels] += value
+    return total
+
+
+def _escape(value):
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+def _sort_key(key):
+    family, suffix, labels = key
+    le = dict(labels).get('le')
+    return (
+        [pair for pair in labels if pair[0] != 'le'],
+        HISTOGRAM_SUFFIXES.index(suffix) if suffix else 0,
+        float(le) if le is not None else 0,
+    )
+
+
+def _format_value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def render(metrics):
+    """Текстовый формат Prometheus 0.0.4."""
+    lines = []
+    for family, (kind, help_text) in FAMILIES.items():
+        keys = sorted(
+            (key for key in metrics if key[0] == family), key=_sort_key
+        )
+        if not keys:
+            continue
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for key in keys:
+            _, suffix, labels = key
+            label_text = ','.join(
+                f'{name}="{_escape(value)}"' for name, value in labels
+            )
+            lines.append(
+                f'{family}{suffix}{{{label_text}}} '
+                f'{_format_value(metrics[key])}'
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def _authorized(request):
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return hmac.compare_digest(header.encode(), expected.encode())
+
+
+def view(request):
+    """Метрики для Prometheus.
+
+    Без METRICS_ENABLED и METRICS_TOKEN адреса нет; с ними нужен
+    заголовок Authorization: Bearer <METRICS_TOKEN>.
+    """
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        raise Http404
+    if not _authorized(request):
+        response = HttpResponse(status=401)
+        response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(
+        render(collect()), content_type='text/plain; version=0.0.4'
+    )
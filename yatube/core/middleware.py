@@ -0,0 +1,67 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics, profiling
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса по имени маршрута.
+
+    Стоит первым в MIDDLEWARE, чтобы время ответа включало остальные
+    middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = metrics.start_request(request)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.count_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            stats = metrics.finish_request(token)
+        match = getattr(request, 'resolver_match', None)
+        metrics.record(
+            match.view_name if match else metrics.UNMATCHED,
+            response.status_code,
+            duration,
+            stats,
+        )
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует view и рендер шаблонов выбранных запросов.
+
+    Стоит после AuthenticationMiddleware: флаг ?profile работает только
+    для сотрудников. id сохранённого профиля возвращается в заголовке
+    X-Profile-Id.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.requested(request):
+            return self.get_response(request)
+        profiler = profiling.start()
+        if profiler is None:
+            return self.get_response(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        response['X-Profile-Id'] = profiling.save(
+            profiler, request, response, time.perf_counter() - started
+        )
+        return response
@@ -0,0 +1,144 @@
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.http import Http404
+from django.utils import timezone
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_FLAG = 'profile'
+TOKEN_SALT = 'core.profiling'
+TOKEN_VALUE = 'profile'
+ID_RE = re.compile(r'^\d+-[0-9a-f]{8}$')
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+
+def make_token():
+    """Подписанное значение заголовка X-Profile."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def _valid_token(token):
+    try:
+        value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILE_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+def requested(request):
+    """Нужно ли профилировать запрос.
+
+    Да, если пришёл действующий подписанный заголовок X-Profile, если
+    сотрудник добавил ?profile к адресу или если запрос выпал в выборку
+    один из PROFILE_SAMPLE_EVERY.
+    """
+    token = request.META.get(HEADER)
+    if token and _valid_token(token):
+        return True
+    if QUERY_FLAG in request.GET and request.user.is_staff:
+        return True
+    every = settings.PROFILE_SAMPLE_EVERY
+    return bool(every) and random.randrange(every) == 0
+
+
+def start():
+    """Запускает профайлер или возвращает None, если он уже занят."""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Другой профайлер уже работает в этом потоке.
+        return None
+    return profiler
+
+
+def save(profiler, request, response, duration):
+    """Сохраняет результат в PROFILE_DIR и возвращает его id.
+
+    Рядом с файлом pstats (его читают snakeviz, flameprof и gprof2dot)
+    лежит JSON с описанием запроса для страницы профилей.
+    """
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profile_id = f'{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}'
+    profiler.dump_stats(_path(profile_id, 'prof'))
+    match = getattr(request, 'resolver_match', None)
+    user = getattr(request, 'user', None)
+    meta = {
+        'id': profile_id,
+        'view': match.view_name if match else '',
+        'method': request.method,
+        'path': request.get_full_path(),
+        'user': user.get_username() if user is not None else '',
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+        'created': timezone.now().isoformat(),
+    }
+    with open(_path(profile_id, 'json'), 'w', encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False)
+    _prune()
+    return profile_id
+
+
+def _path(profile_id, extension):
+    return os.path.join(settings.PROFILE_DIR, f'{profile_id}.{extension}')
+
+
+def _ids():
+    """id сохранённых профилей, от новых к старым."""
+    names = glob.glob(os.path.join(settings.PROFILE_DIR, '*.json'))
+    return sorted(
+        (os.path.basename(name)[:-len('.json')] for name in names),
+        key=lambda profile_id: int(profile_id.split('-')[0]),
+        reverse=True,
+    )
+
+
+def _prune():
+    for profile_id in _ids()[settings.PROFILE_KEEP:]:
+        for extension in ('prof', 'json'):
+            try:
+                os.remove(_path(profile_id, extension))
+            except FileNotFoundError:
+                pass
+
+
+def recent(view=None):
+    """Описания последних профилей, при view — только этого маршрута."""
+    profiles = []
+    for profile_id in _ids():
+        try:
+            with open(_path(profile_id, 'json'), encoding='utf-8') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if view is None or meta['view'] == view:
+            profiles.append(meta)
+    return profiles
+
+
+def stats_path(profile_id):
+    """Путь к файлу pstats или Http404."""
+    path = _path(profile_id, 'prof')
+    if not ID_RE.match(profile_id) or not os.path.exists(path):
+        raise Http404
+    return path
+
+
+def report(profile_id, sort='cumulative', limit=60):
+    """Текстовая сводка pstats по самым дорогим функциям."""
+    stream = io.StringIO()
+    stats = pstats.Stats(stats_path(profile_id), stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
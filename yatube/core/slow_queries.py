@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger('yatube.slow_queries')
+
+# Строка плана SQLite для полного просмотра таблицы. До 3.36 SQLite
+# пишет «SCAN TABLE t», позже — «SCAN t»; за именем может идти способ
+# просмотра, например «USING COVERING INDEX».
+FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?\S+')
+MAX_PARAM_LENGTH = 200
+MAX_FRAMES = 5
+# Сколько разных текстов запросов помнит ограничитель частоты
+MAX_TRACKED = 10000
+CORE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+# Когда каждый текст запроса последний раз попал в лог и сколько раз
+# его с тех пор пропустили. Гонки потоков здесь безвредны: в худшем
+# случае запрос запишется дважды.
+_last_logged = {}
+_suppressed = {}
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик connection_created: вешает обёртку на соединение.
+
+    Обёртка ставится в начало списка: execute_wrapper() снимает свою
+    обёртку с конца, и соединение, открытое внутри такого блока, не
+    должно сдвинуть её место.
+    """
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow_query)
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """Обёртка execute: пишет в лог запросы дольше порога."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold is not None and duration * 1000 >= threshold:
+            _report(sql, params, many, duration, context['connection'])
+
+
+def _allowed(sql):
+    """Один и тот же текст запроса — не чаще раза в интервал."""
+    now = time.monotonic()
+    if len(_last_logged) > MAX_TRACKED:
+        _last_logged.clear()
+        _suppressed.clear()
+    last = _last_logged.get(sql)
+    if last is not None and now - last < settings.SLOW_QUERY_LOG_INTERVAL:
+        _suppressed[sql] = _suppressed.get(sql, 0) + 1
+        return False
+    _last_logged[sql] = now
+    return True
+
+
+def _report(sql, params, many, duration, connection):
+    if not _allowed(sql):
+        return
+    plan = None if many else explain(connection, sql, params)
+    record = {
+        'duration_ms': round(duration * 1000, 2),
+        'sql': sql,
+        'params': None if many else [
+            repr(param)[:MAX_PARAM_LENGTH] for param in params or ()
+        ],
+        'view': _view_name(),
+        'stack': call_site(),
+        'plan': plan,
+        'full_scan': bool(plan) and any(
+            FULL_SCAN_RE.match(row) for row in plan
+        ),
+        'suppressed': _suppressed.pop(sql, 0),
+    }
+    logger.warning(json.dumps(record, ensure_ascii=False))
+
+
+def _view_name():
+    stats = metrics.current()
+    match = getattr(stats and stats.request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+def call_site():
+    """Кадры кода проекта, из которых пришёл запрос, от ближнего.
+
+    Кадры Django и сторонних пакетов пропускаются, как и сам core:
+    важно, какая строка приложения (view, пагинатор, тег) его вызвала.
+    """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < MAX_FRAMES:
+        path = frame.f_code.co_filename
+        if _is_project_code(path):
+            relative = path[len(settings.BASE_DIR) + 1:]
+            frames.append(
+                f'{relative}:{frame.f_lineno} in {frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+    return frames
+
+
+def _is_project_code(path):
+    return (
+        path.startswith(settings.BASE_DIR)
+        and not path.startswith(CORE_DIR)
+        and 'site-packages' not in path
+    )
+
+
+def explain(connection, sql, params):
+    """Строки EXPLAIN QUERY PLAN для SQLite, иначе None.
+
+    Курсор берётся через create_cursor(), мимо обёрток execute, чтобы
+    план не попал в лог и не посчитался в метриках запроса.
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+    except connection.Database.DatabaseError as error:
+        return [f'EXPLAIN не удался: {error}']
+    finally:
+        cursor.close()
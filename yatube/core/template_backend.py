@@ -0,0 +1,48 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from . import metrics, tracing
+
+
+class TimedTemplate(Template):
+    """Шаблон, время рендера которого попадает в метрики и трассу.
+
+    Вложенный рендер (например, карточек постов внутри страницы) уже
+    входит во время внешнего и отдельно не прибавляется.
+    """
+
+    def render(self, context=None, request=None):
+        with tracing.span('template.render', **{
+            'template.name': self.origin.template_name or '',
+        }):
+            return self._render(context, request)
+
+    def _render(self, context, request):
+        stats = metrics.current()
+        if stats is None:
+            return super().render(context, request)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд DjangoTemplates, отдающий TimedTemplate."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,26 @@
+from django import template
+from django.template.loader_tags import IncludeNode, do_include
+
+from core import tracing
+
+register = template.Library()
+
+
+class TracedIncludeNode(IncludeNode):
+    def render(self, context):
+        with tracing.span('template.include', **{
+            'template.name': str(self.template.token),
+        }):
+            return super().render(context)
+
+
+@register.tag('include')
+def do_traced_include(parser, token):
+    """{% include %}, каждый рендер которого — интервал трассы.
+
+    Библиотека подключена в builtins шаблонизатора и заменяет
+    стандартный тег во всех шаблонах.
+    """
+    node = do_include(parser, token)
+    node.__class__ = TracedIncludeNode
+    return node
@@ -0,0 +1,357 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+
+from posts.models import Group
+
+from . import metrics, profiling, slow_queries, tracing
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_PROFILE_DIR = tempfile.mkdtemp()
+TEMP_LOG_DIR = tempfile.mkdtemp()
+CONTENT = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'a.jpg'), 'wb') as f:
+            f.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    url = '/media/posts/a.jpg'
+
+    def test_full_file_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertFalse(response['ETag'].startswith('W/'))
+        self.assertIn('Last-Modified', response)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_range(self):
+        cases = {
+            'bytes=10-19': (10, 20),
+            'bytes=1000-': (1000, 1024),
+            'bytes=-4': (1020, 1024),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT
+                )
+                self.assertEqual(
+                    b''.join(response.streaming_content), CONTENT[start:end]
+                )
+                self.assertEqual(
+                    response['Content-Range'],
+                    f'bytes {start}-{end - 1}/{len(CONTENT)}',
+                )
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    def test_stale_if_range_returns_whole_file(self):
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_bad_paths_are_not_found(self):
+        for url in ('/media/posts/../../manage.py', '/media/.hidden',
+                    '/media/posts/', '/media/posts/missing.jpg'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/a.jpg'
+        )
+        self.assertEqual(response.content, b'')
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    def get_metrics(self):
+        return self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+
+    def test_requests_are_recorded_by_route(self):
+        self.client.get('/')
+        text = self.get_metrics().content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"}', text
+        )
+        self.assertIn(
+            'yatube_responses_total{view="posts:index",status="200"}', text
+        )
+        queries = next(
+            line for line in text.splitlines() if line.startswith(
+                'yatube_db_queries_total{view="posts:index"}'
+            )
+        )
+        self.assertGreater(float(queries.split()[-1]), 0)
+        self.assertIn('yatube_template_render_seconds_total', text)
+        self.assertIn(
+            'yatube_cache_requests_total{view="posts:index",result="miss"}',
+            text,
+        )
+
+    def test_token_is_required(self):
+        for header in ('', 'Bearer wrong', 'secret'):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    '/metrics', HTTP_AUTHORIZATION=header,
+                    REMOTE_ADDR='127.0.0.1',
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.UNAUTHORIZED
+                )
+
+    def test_disabled_by_default(self):
+        for overrides in ({'METRICS_ENABLED': False}, {'METRICS_TOKEN': None}):
+            with self.subTest(**overrides), override_settings(**overrides):
+                response = self.get_metrics()
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_finished_threads_are_folded_into_process_total(self):
+        before = len(metrics._aggregates)
+        stats = metrics.RequestStats(None)
+        threads = [
+            threading.Thread(
+                target=metrics.record, args=('threaded', 200, 0.01, stats)
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        self.assertEqual(len(metrics._aggregates), before)
+        key = (
+            'yatube_responses_total', '',
+            (('view', 'threaded'), ('status', '200')),
+        )
+        self.assertEqual(metrics.snapshot()[key], 5)
+
+    def test_workers_are_merged_through_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        key = ['yatube_responses_total', '', [
+            ['view', 'other'], ['status', '200'],
+        ]]
+        with open(os.path.join(directory, '1.json'), 'w') as worker:
+            json.dump([key + [5]], worker)
+        with override_settings(METRICS_DIR=directory):
+            metrics.flush()
+            self.assertTrue(
+                os.path.exists(os.path.join(directory, f'{os.getpid()}.json'))
+            )
+            text = self.get_metrics().content.decode()
+        self.assertIn(
+            'yatube_responses_total{view="other",status="200"} 5\n', text
+        )
+
+
+@override_settings(PROFILE_DIR=TEMP_PROFILE_DIR)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = get_user_model().objects.create_user(
+            username='staff', is_staff=True
+        )
+
+    def setUp(self):
+        shutil.rmtree(TEMP_PROFILE_DIR, ignore_errors=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILE_DIR, ignore_errors=True)
+
+    def test_query_flag_is_for_staff_only(self):
+        response = self.client.get('/', {'profile': ''})
+        self.assertNotIn('X-Profile-Id', response)
+        self.client.force_login(self.staff)
+        response = self.client.get('/', {'profile': ''})
+        profile_id = response['X-Profile-Id']
+        listing = self.client.get('/profiles/')
+        self.assertContains(listing, profile_id)
+        self.assertContains(listing, 'posts:index')
+        detail = self.client.get(f'/profiles/{profile_id}/')
+        self.assertContains(detail, 'cumulative')
+        download = self.client.get(f'/profiles/{profile_id}/download/')
+        self.assertEqual(download.status_code, HTTPStatus.OK)
+
+    def test_signed_header(self):
+        response = self.client.get('/', HTTP_X_PROFILE='profile:bad:sig')
+        self.assertNotIn('X-Profile-Id', response)
+        response = self.client.get(
+            '/', HTTP_X_PROFILE=profiling.make_token()
+        )
+        self.assertIn('X-Profile-Id', response)
+
+    @override_settings(PROFILE_SAMPLE_EVERY=1, PROFILE_KEEP=1)
+    def test_sampling_keeps_latest(self):
+        self.client.get('/')
+        self.client.get('/about/author/')
+        profiles = profiling.recent()
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0]['view'], 'about:author')
+
+    def test_pages_are_for_staff_only(self):
+        response = self.client.get('/profiles/')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.client.force_login(self.staff)
+        response = self.client.get('/profiles/settings/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class TracingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.trace_file = os.path.join(directory, 'traces.ndjson')
+
+    def get(self, rate):
+        with override_settings(
+            TRACE_SAMPLE_RATE=rate, TRACE_FILE=self.trace_file
+        ):
+            handler = tracing.TracingWSGIHandler()
+            return handler.get_response(RequestFactory().get('/'))
+
+    def test_spans_cover_all_layers(self):
+        self.assertEqual(self.get(1).status_code, HTTPStatus.OK)
+        with open(self.trace_file) as traces:
+            payload = json.loads(traces.readline())
+        spans = payload['resourceSpans'][0]['scopeSpans'][0]['spans']
+        names = {span['name'] for span in spans}
+        for name in (
+            'request', 'middleware', 'view.dispatch', 'view', 'db.query',
+            'cache.get_many', 'template.render', 'template.include',
+        ):
+            self.assertIn(name, names)
+        ids = {span['spanId'] for span in spans}
+        roots = [span for span in spans if not span['parentSpanId']]
+        self.assertEqual([span['name'] for span in roots], ['request'])
+        for span in spans:
+            self.assertTrue(not span['parentSpanId'] or (
+                span['parentSpanId'] in ids
+            ))
+        self.assertEqual(len({span['traceId'] for span in spans}), 1)
+
+    def test_unsampled_requests_are_not_traced(self):
+        self.get(0)
+        self.assertFalse(os.path.exists(self.trace_file))
+
+
+@override_settings(
+    SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_INTERVAL=60,
+    SLOW_QUERY_LOG_FILE=os.path.join(TEMP_LOG_DIR, 'slow_queries.log'),
+)
+class SlowQueryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Обработчик из LOGGING создан при запуске с путём из настроек,
+        # поэтому подменяем его: тесты не должны писать в BASE_DIR.
+        cls.handler = logging.FileHandler(
+            os.path.join(TEMP_LOG_DIR, 'slow_queries.log'),
+            encoding='utf-8', delay=True,
+        )
+        cls.handlers = mock.patch.object(
+            slow_queries.logger, 'handlers', [cls.handler]
+        )
+        cls.handlers.start()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.handlers.stop()
+        cls.handler.close()
+        shutil.rmtree(TEMP_LOG_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        slow_queries._last_logged.clear()
+        slow_queries._suppressed.clear()
+
+    def records(self, logs):
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_records_carry_view_call_site_and_plan(self):
+        with self.assertLogs('yatube.slow_queries') as logs:
+            self.client.get(f'/group/{self.group.slug}/')
+        records = [
+            record for record in self.records(logs)
+            if record['view'] == 'posts:group_list'
+        ]
+        self.assertTrue(records)
+        self.assertTrue(all(
+            record['stack'][0].startswith('posts/') for record in records
+            if record['stack']
+        ))
+        self.assertTrue(all(record['plan'] for record in records))
+
+    def test_same_statement_is_rate_limited(self):
+        url = f'/group/{self.group.slug}/'
+        with self.assertLogs('yatube.slow_queries') as logs:
+            self.client.get(url)
+            cache.clear()
+            self.client.get(url)
+        statements = [record['sql'] for record in self.records(logs)]
+        self.assertEqual(len(statements), len(set(statements)))
+
+    def test_full_scan_is_flagged(self):
+        plan = slow_queries.explain(
+            connection, 'SELECT * FROM posts_post WHERE text = %s', ['x']
+        )
+        self.assertTrue(any(
+            slow_queries.FULL_SCAN_RE.match(row) for row in plan
+        ))
+        for row in ('SCAN TABLE posts_post', 'SCAN posts_post'):
+            with self.subTest(row=row):
+                self.assertTrue(slow_queries.FULL_SCAN_RE.match(row))
+        self.assertFalse(slow_queries.FULL_SCAN_RE.match(
+            'SEARCH posts_post USING INTEGER PRIMARY KEY (rowid=?)'
+        ))
+
+    def test_log_file_is_written_outside_base_dir(self):
+        self.client.get(f'/group/{self.group.slug}/')
+        self.assertTrue(os.path.exists(settings.SLOW_QUERY_LOG_FILE))
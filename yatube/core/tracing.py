@@ -0,0 +1,204 @@
+import json
+import random
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+
+SERVICE_NAME = 'yatube'
+
+# Трасса текущего запроса; вне выбранных запросов — None, и span()
+# ничего не делает
+_trace = ContextVar('trace', default=None)
+_export_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans = []
+        self.stack = []
+        self.dropped = 0
+
+
+@contextmanager
+def span(name, **attributes):
+    """Интервал трассы с атрибутами; вложенные интервалы — его дети."""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    record = {
+        'spanId': uuid.uuid4().hex[:16],
+        'parentSpanId': trace.stack[-1]['spanId'] if trace.stack else '',
+        'name': name,
+        'attributes': attributes,
+        'startTimeUnixNano': time.time_ns(),
+    }
+    trace.stack.append(record)
+    try:
+        yield record
+    finally:
+        trace.stack.pop()
+        record['endTimeUnixNano'] = time.time_ns()
+        if len(trace.spans) < settings.TRACE_MAX_SPANS:
+            trace.spans.append(record)
+        else:
+            trace.dropped += 1
+
+
+def traced(name, function, **attributes):
+    """function, каждый вызов которой — интервал name."""
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with span(name, **attributes):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def trace_query(execute, sql, params, many, context):
+    """Обёртка connection.execute_wrapper: интервал на каждый запрос."""
+    with span(
+        'db.query', **{
+            'db.system': context['connection'].vendor,
+            'db.statement': sql,
+            'db.many': many,
+        }
+    ):
+        return execute(sql, params, many, context)
+
+
+def _attribute_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': value}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_span(trace, record):
+    return {
+        **record,
+        'traceId': trace.trace_id,
+        'attributes': [
+            {'key': key, 'value': _attribute_value(value)}
+            for key, value in record['attributes'].items()
+        ],
+    }
+
+
+def export(trace):
+    """Дописывает трассу строкой в TRACE_FILE.
+
+    Каждая строка — запрос ExportTraceServiceRequest в JSON-кодировке
+    OTLP, поэтому файл читает filelog-приёмник OpenTelemetry Collector
+    и его можно переслать в любой совместимый бэкенд.
+    """
+    payload = {'resourceSpans': [{
+        'resource': {'attributes': [{
+            'key': 'service.name',
+            'value': {'stringValue': SERVICE_NAME},
+        }]},
+        'scopeSpans': [{
+            'scope': {'name': __name__},
+            'spans': [_otlp_span(trace, record) for record in trace.spans],
+        }],
+    }]}
+    line = json.dumps(payload, ensure_ascii=False) + '\n'
+    with _export_lock:
+        with open(settings.TRACE_FILE, 'a', encoding='utf-8') as file:
+            file.write(line)
+
+
+def sampled():
+    rate = settings.TRACE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class TracingWSGIHandler(WSGIHandler):
+    """WSGI-обработчик, который трассирует выбранные запросы.
+
+    Интервалы открываются на весь запрос, на каждое middleware (вместе
+    с вложенными), на view и на каждый SQL-запрос; кэш, шаблоны и
+    миниатюры добавляют свои интервалы через span().
+    """
+
+    def load_middleware(self):
+        super().load_middleware()
+        # Каждое middleware хранит следующее звено цепочки в get_response
+        # (так устроены MiddlewareMixin и middleware-классы проекта);
+        # оборачиваем звенья, пока цепочка не кончится.
+        self._middleware_chain = handler = self._traced(
+            self._middleware_chain
+        )
+        while True:
+            instance = getattr(handler.__wrapped__, '__wrapped__', None)
+            if getattr(instance, 'get_response', None) is None:
+                break
+            instance.get_response = handler = self._traced(
+                instance.get_response
+            )
+
+    @staticmethod
+    def _traced(handler):
+        # handler — результат convert_exception_to_response, его
+        # __wrapped__ — экземпляр middleware или _get_response.
+        instance = handler.__wrapped__
+        if not hasattr(instance, 'get_response'):
+            return traced('view.dispatch', handler)
+        name = f'{type(instance).__module__}.{type(instance).__name__}'
+        return traced('middleware', handler, **{'middleware.name': name})
+
+    def make_view_atomic(self, view):
+        view = super().make_view_atomic(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with span('view', **{'view.name': _view_name(request)}):
+                return view(request, *args, **kwargs)
+        return wrapper
+
+    def get_response(self, request):
+        if not sampled():
+            return super().get_response(request)
+        trace = Trace()
+        token = _trace.set(trace)
+        try:
+            with span('request', **{
+                'http.method': request.method,
+                'http.target': request.get_full_path(),
+            }) as root, ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(trace_query)
+                    )
+                response = super().get_response(request)
+                root['attributes'].update({
+                    'http.status_code': response.status_code,
+                    'view.name': _view_name(request),
+                    'trace.dropped_spans': trace.dropped,
+                })
+        finally:
+            _trace.reset(token)
+        export(trace)
+        return response
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else ''
+
+
+def get_wsgi_application():
+    """Как django.core.wsgi.get_wsgi_application, но с трассировкой."""
+    django.setup(set_prefix=False)
+    return TracingWSGIHandler()
@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse
 from django.shortcuts import render
 
+from . import profiling
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +19,40 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profile_list(request):
+    view = request.GET.get('view')
+    profiles = profiling.recent()
+    context = {
+        'profiles': [
+            meta for meta in profiles if view is None or meta['view'] == view
+        ],
+        'views': sorted({meta['view'] for meta in profiles}),
+        'view': view,
+    }
+    return render(request, 'core/profiles.html', context)
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    sort = request.GET.get('sort')
+    if sort not in profiling.SORT_KEYS:
+        sort = profiling.SORT_KEYS[0]
+    context = {
+        'profile_id': profile_id,
+        'report': profiling.report(profile_id, sort),
+        'sort': sort,
+        'sort_keys': profiling.SORT_KEYS,
+    }
+    return render(request, 'core/profile_detail.html', context)
+
+
+@staff_member_required
+def profile_download(request, profile_id):
+    return FileResponse(
+        open(profiling.stats_path(profile_id), 'rb'),
+        as_attachment=True,
+        filename=f'{profile_id}.prof',
+    )
@@ -0,0 +1,199 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import urls
+from .dataset import generate_rows
+from .importer import Importer
+from .models import Follow, Group, Post, User
+
+# Набор данных для замеров: достаточно большой, чтобы N+1 и полные
+# просмотры таблиц были заметны, и быстро создаётся
+DATASET = {
+    'users': 2000,
+    'groups': 20,
+    'posts': 20000,
+    'comments': 40000,
+    'follows': 3000,
+}
+SEED = 0
+
+# Допуски при сравнении с базовой линией. Число запросов не зависит
+# от машины и должно совпадать; время и память — с запасом на шум.
+QUERY_TOLERANCE = 0
+LATENCY_TOLERANCE = 0.5
+LATENCY_SLACK_MS = 5
+MEMORY_TOLERANCE = 0.25
+MEMORY_SLACK_KB = 64
+
+
+def seed():
+    """Создаёт набор данных и читателя, от имени которого идут запросы."""
+    # Ленты подписок остальных пользователей для замеров не нужны, а
+    # их заполнение занимает большую часть времени; ленту читателя
+    # заполняют сигналы при подписке.
+    Importer(
+        'benchmark', generate_rows(SEED, **DATASET), timelines=False
+    ).run()
+    reader = User.objects.create_user(username='benchmark')
+    for number in range(1, 21):
+        Follow.objects.create(
+            user=reader, author=User.objects.get(username=f'user{number}')
+        )
+    own_post = Post.objects.create(text='Пост читателя', author=reader)
+    return {
+        'reader': reader,
+        'own_post': own_post,
+        'post': Post.objects.order_by('-comments_count').first(),
+        'group': Group.objects.get(slug='group-1'),
+        'author': User.objects.get(username='user1'),
+        'followed': User.objects.get(username='user30'),
+    }
+
+
+def routes(data):
+    """Запросы для каждого именованного маршрута posts.urls.
+
+    Подписка и отписка идут парой, поэтому состояние после каждого
+    прохода одинаковое.
+    """
+    post, own_post = data['post'].pk, data['own_post'].pk
+    return {
+        'index': (reverse('posts:index'), {}),
+        'group_list': (
+            reverse('posts:group_list', args=[data['group'].slug]), {}
+        ),
+        'profile': (
+            reverse('posts:profile', args=[data['author'].username]), {}
+        ),
+        'search': (reverse('posts:search'), {'q': 'город'}),
+        'post_detail': (reverse('posts:post_detail', args=[post]), {}),
+        'post_comments': (reverse('posts:post_comments', args=[post]), {}),
+        'post_create': (reverse('posts:post_create'), {}),
+        'post_edit': (reverse('posts:post_edit', args=[own_post]), {}),
+        'add_comment': (reverse('posts:add_comment', args=[post]), {}),
+        'follow_index': (reverse('posts:follow_index'), {}),
+        'profile_export': (
+            reverse('posts:profile_export', args=['benchmark']), {}
+        ),
+        'profile_follow': (
+            reverse('posts:profile_follow', args=[data['followed'].username]),
+            {},
+        ),
+        'profile_unfollow': (
+            reverse(
+                'posts:profile_unfollow', args=[data['followed'].username]
+            ),
+            {},
+        ),
+    }
+
+
+def missing_routes(specs):
+    names = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+    return sorted(names - set(specs))
+
+
+def request(client, url, params):
+    response = client.get(url, params)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(specs, client, iterations):
+    """Прогоняет все маршруты iterations раз и собирает метрики.
+
+    Кэш очищается перед каждым запросом: замеряется полный рендер.
+    Память считается отдельным проходом — tracemalloc замедляет код.
+    """
+    latencies = {name: [] for name in specs}
+    queries = {name: 0 for name in specs}
+    for iteration in range(iterations + 1):
+        for name, (url, params) in specs.items():
+            cache.clear()
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                request(client, url, params)
+                elapsed = time.perf_counter() - started
+            # Первый проход — прогрев, он не учитывается.
+            if iteration:
+                latencies[name].append(elapsed * 1000)
+                queries[name] = max(queries[name], len(captured))
+    memory = {}
+    for name, (url, params) in specs.items():
+        cache.clear()
+        tracemalloc.start()
+        request(client, url, params)
+        memory[name] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return {
+        name: {
+            'p50_ms': round(statistics.median(latencies[name]), 2),
+            'p95_ms': round(percentile(latencies[name], 0.95), 2),
+            'queries': queries[name],
+            'peak_kb': memory[name],
+        }
+        for name in specs
+    }
+
+
+def run(iterations):
+    data = seed()
+    client = Client()
+    client.force_login(data['reader'])
+    specs = routes(data)
+    missing = missing_routes(specs)
+    if missing:
+        raise ValueError(
+            'Нет замеров для маршрутов: ' + ', '.join(missing)
+        )
+    return measure(specs, client, iterations)
+
+
+def compare(results, baseline):
+    """Список регрессий относительно базовой линии."""
+    regressions = []
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        limits = {
+            'queries': base['queries'] + QUERY_TOLERANCE,
+            'p95_ms': base['p95_ms'] * (1 + LATENCY_TOLERANCE)
+            + LATENCY_SLACK_MS,
+            'peak_kb': base['peak_kb'] * (1 + MEMORY_TOLERANCE)
+            + MEMORY_SLACK_KB,
+        }
+        for metric, limit in limits.items():
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {current[metric]} '
+                    f'(база {base[metric]}, предел {limit:.2f})'
+                )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump(results, baseline, indent=2, sort_keys=True)
+        baseline.write('\n')
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .kvstore import prefetch
+from .thumbnails import attach_variants
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+# Что показывает карточка в разных лентах
+VARIANTS = {
+    'feed': {'show_author': True, 'show_group': True},
+    'group': {'show_author': True, 'show_group': False},
+    'profile': {'show_author': False, 'show_group': True},
+}
+
+
+def card_key(post, variant):
+    return f'post_card:{variant}:{post.pk}:{post.version}'
+
+
+def render_cards(posts, variant='feed'):
+    """Возвращает HTML карточек постов страницы из кэша фрагментов.
+
+    Все ключи читаются одним get_many, рендерятся только промахи,
+    и они записываются обратно одним set_many. Копии картинок для
+    промахов и записи их миниатюр в sorl читаются пачкой.
+    """
+    posts = list(posts)
+    keys = [card_key(post, variant) for post in posts]
+    cards = cache.get_many(keys)
+    misses = [(key, post) for key, post in zip(keys, posts)
+              if key not in cards]
+    attach_variants([post for key, post in misses])
+    # Миниатюры нужны только постам, для которых ещё нет копий srcset.
+    with prefetch(post.image for key, post in misses
+                  if not getattr(post, 'image_sources', None)):
+        missing = {
+            key: render_to_string(
+                CARD_TEMPLATE, {'post': post, **VARIANTS[variant]}
+            )
+            for key, post in misses
+        }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.checks import Error, Tags, register
+
+# Бэкенды, у которых каждый процесс видит только свой кэш
+LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Поколения лент (page_cache) должны быть общими для процессов.
+
+    При локальном кэше пост, опубликованный в одном процессе, не сбросит
+    страницы лент, закэшированные остальными.
+    """
+    config = settings.CACHES.get(DEFAULT_CACHE_ALIAS, {})
+    backend = config.get('WRAPPED_BACKEND', config.get('BACKEND'))
+    if backend not in LOCAL_CACHES:
+        return []
+    return [Error(
+        f'Кэш {backend} не общий для процессов: инвалидация страниц лент '
+        'не дойдёт до остальных процессов.',
+        hint='Укажите в CACHES общий бэкенд: Memcached, Redis, базу '
+             'данных или файлы.',
+        id='posts.E001',
+    )]
@@ -0,0 +1,59 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .utils import bulk_batch_size
+
+
+def _bumped(field, delta):
+    # Счётчик мог разойтись с таблицами (bulk_create, queryset.update),
+    # и уменьшение ниже нуля нарушило бы CHECK положительного поля,
+    # сорвав удаление; расхождение исправляет reconcile().
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def bump(model, pk, **deltas):
+    """Атомарно изменяет счётчики строки через F-выражения."""
+    if pk is None:
+        return
+    model.objects.filter(pk=pk).update(
+        **{field: _bumped(field, delta) for field, delta in deltas.items()}
+    )
+
+
+def bump_author(user_id, **deltas):
+    AuthorStats.objects.get_or_create(user_id=user_id)
+    bump(AuthorStats, user_id, **deltas)
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def reconcile():
+    """Пересчитывает все счётчики по исходным таблицам."""
+    missing = [
+        AuthorStats(user_id=user_id)
+        for user_id in User.objects.filter(
+            stats__isnull=True
+        ).values_list('pk', flat=True)
+    ]
+    AuthorStats.objects.bulk_create(
+        missing, batch_size=bulk_batch_size(AuthorStats, missing, 1000)
+    )
+    Group.objects.update(posts_count=_count(Post.objects, 'group'))
+    Post.objects.update(comments_count=_count(Comment.objects, 'post'))
+    AuthorStats.objects.update(
+        posts_count=_count(Post.objects, 'author'),
+        followers_count=_count(Follow.objects, 'author'),
+        following_count=_count(Follow.objects, 'user'),
+    )
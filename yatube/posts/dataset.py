@@ -0,0 +1,147 @@
+import random
+from bisect import bisect
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+
+WORDS = (
+    'день ночь город дом дорога река лес поле небо солнце дождь снег '
+    'ветер море берег гора друг время жизнь работа книга письмо слово '
+    'мысль память история вопрос ответ утро вечер неделя год окно дверь '
+    'свет тень голос песня музыка улица площадь мост поезд вокзал '
+    'новый старый большой маленький тихий быстрый долгий тёплый '
+    'холодный светлый тёмный добрый видеть слышать думать писать '
+    'читать говорить идти ждать помнить любить знать верить сегодня '
+    'вчера завтра снова всегда иногда почти очень тоже только уже'
+).split()
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Лев', 'Нина')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов')
+
+# Медиана длины поста около 20 слов, длинный хвост до MAX_WORDS
+WORDS_MU = 3.0
+WORDS_SIGMA = 1.0
+MAX_WORDS = 1500
+
+# Показатель степенного закона для популярности авторов и групп
+ZIPF_EXPONENT = 1.1
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+SPAN = timedelta(days=365 * 3)
+
+
+def zipf_weights(count):
+    """Накопленные веса 1 / rank ** ZIPF_EXPONENT для bisect."""
+    return list(accumulate(
+        1 / rank ** ZIPF_EXPONENT for rank in range(1, count + 1)
+    ))
+
+
+def pick(rng, cumulative):
+    """Номер от 1 до len(cumulative) со степенным распределением."""
+    return bisect(cumulative, rng.random() * cumulative[-1]) + 1
+
+
+def text(rng):
+    words = min(MAX_WORDS, max(1, int(rng.lognormvariate(
+        WORDS_MU, WORDS_SIGMA
+    ))))
+    return ' '.join(rng.choices(WORDS, k=words)).capitalize() + '.'
+
+
+def post_date(number, posts):
+    """Даты постов растут вместе с их номером, как в живой базе."""
+    return START + SPAN * number / posts
+
+
+def make_images(count, seed):
+    """Создаёт в хранилище count картинок и возвращает их имена."""
+    rng = random.Random(seed)
+    names = []
+    for number in range(1, count + 1):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        content = BytesIO()
+        Image.new('RGB', (1280, 720), color).save(content, format='JPEG')
+        name = f'posts/generated/{number}.jpg'
+        # Повторный запуск переиспользует файлы: имена должны совпасть.
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(content.getvalue()))
+        names.append(name)
+    return names
+
+
+def generate_rows(seed, users, groups, posts, comments, follows,
+                  images=()):
+    """Строки синтетического набора в формате дампа posts.importer.
+
+    При одном seed и одних размерах строки всегда одинаковые, поэтому
+    прерванную загрузку можно продолжить. Авторы постов, группы и
+    авторы в подписках выбираются по степенному закону: немногие
+    популярны, большинство — почти нет.
+    """
+    rng = random.Random(seed)
+    for number in range(1, users + 1):
+        yield {
+            'type': 'user',
+            'username': f'user{number}',
+            'first_name': rng.choice(FIRST_NAMES),
+            'last_name': rng.choice(LAST_NAMES),
+        }
+    for number in range(1, groups + 1):
+        yield {
+            'type': 'group',
+            'slug': f'group-{number}',
+            'title': f'Группа {number}',
+            'description': text(rng),
+        }
+    user_weights = zipf_weights(users)
+    group_weights = zipf_weights(groups) if groups else None
+    for number in range(1, posts + 1):
+        # Примерно треть постов — без группы.
+        has_group = group_weights and rng.random() < 0.7
+        yield {
+            'type': 'post',
+            'id': number,
+            'author': f'user{pick(rng, user_weights)}',
+            'group': (
+                f'group-{pick(rng, group_weights)}' if has_group else None
+            ),
+            'pub_date': post_date(number, posts).isoformat(),
+            'text': text(rng),
+            'image': (
+                rng.choice(images) if images and rng.random() < 0.2 else None
+            ),
+        }
+    for number in range(1, comments + 1 if posts else 1):
+        post = rng.randint(1, posts)
+        created = post_date(post, posts) + timedelta(
+            minutes=rng.expovariate(1 / 600)
+        )
+        yield {
+            'type': 'comment',
+            'id': number,
+            'post': post,
+            # Комментируют все, а не только популярные авторы.
+            'author': f'user{rng.randint(1, users)}',
+            'created': created.isoformat(),
+            'text': text(rng),
+        }
+    # Степенной закон для подписчиков: у немногих авторов их тысячи.
+    pairs = set()
+    attempts = 0
+    while len(pairs) < follows and attempts < follows * 10:
+        attempts += 1
+        user = rng.randint(1, users)
+        author = pick(rng, user_weights)
+        if user == author or (user, author) in pairs:
+            continue
+        pairs.add((user, author))
+        yield {
+            'type': 'follow',
+            'user': f'user{user}',
+            'author': f'user{author}',
+        }
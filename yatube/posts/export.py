@@ -0,0 +1,71 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import Comment, Post
+
+# Столбцы CSV: общие для постов и комментариев, лишние остаются пустыми
+CSV_FIELDS = (
+    'type', 'id', 'post', 'author', 'group', 'pub_date', 'created', 'text',
+    'image',
+)
+
+
+def export_rows(author, images=False):
+    """Посты и комментарии автора словарями, без загрузки всех в память.
+
+    Строки читаются через values() и iterator(chunk_size=...): из базы
+    приходит по EXPORT_CHUNK_SIZE строк, объекты моделей не создаются.
+    """
+    post_fields = ['id', 'text', 'pub_date']
+    if images:
+        post_fields.append('image')
+    posts = Post.objects.filter(author=author).order_by('id').values(
+        *post_fields, group_slug=F('group__slug')
+    )
+    for row in posts.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        row['type'] = 'post'
+        row['author'] = author.username
+        row['group'] = row.pop('group_slug')
+        if images:
+            row['image'] = row['image'] or None
+        yield row
+    comments = Comment.objects.filter(author=author).order_by('id').values(
+        'id', 'post', 'text', 'created'
+    )
+    for row in comments.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        row['type'] = 'comment'
+        row['author'] = author.username
+        yield row
+
+
+def to_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False)
+        yield '\n'
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку, не копит."""
+
+    def write(self, value):
+        return value
+
+
+def to_csv(rows):
+    writer = csv.DictWriter(Echo(), CSV_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        for key in ('pub_date', 'created'):
+            if key in row:
+                row[key] = row[key].isoformat()
+        yield writer.writerow(row)
+
+
+FORMATS = {
+    'ndjson': (to_ndjson, 'application/x-ndjson'),
+    'csv': (to_csv, 'text/csv'),
+}
@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 from .models import Post, Comment
+from .uploads import TOO_LARGE, check_size
 
 
 class PostForm(forms.ModelForm):
@@ -13,6 +16,22 @@ class PostForm(forms.ModelForm):
                 raise forms.ValidationError('Обязательное для заполнения поле')
             return data
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        image = self.files.get('image')
+        if getattr(image, 'too_large', False):
+            # Обрезанный обработчиком загрузки файл не откроется как
+            # картинка — вместо «неверного изображения» пишем причину.
+            self.fields['image'].error_messages['invalid_image'] = (
+                TOO_LARGE.format(limit=settings.MAX_UPLOAD_SIZE // 2 ** 20)
+            )
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            check_size(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,276 @@
+import csv
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+
+from . import counters, page_cache, timeline
+from .models import Comment, Follow, Group, ImportProgress, Post, User
+from .utils import bulk_batch_size
+
+# Порядок загрузки внутри порции: сначала те, на кого ссылаются
+TYPES = ('user', 'group', 'post', 'comment', 'follow')
+
+
+class DumpError(Exception):
+    """Строка дампа, которую нельзя загрузить."""
+
+
+def read_rows(path):
+    """Строки дампа словарями: NDJSON или CSV (по расширению файла).
+
+    В CSV пустые ячейки считаются отсутствующими значениями.
+    """
+    with open(path, encoding='utf-8', newline='') as dump:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(dump):
+                yield {key: value or None for key, value in row.items()}
+        else:
+            for line in dump:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def max_pk(model):
+    return model.objects.aggregate(pk=Max('pk'))['pk'] or 0
+
+
+def set_offsets(dump_set):
+    """Сдвиги id постов и комментариев для нового файла набора."""
+    first = ImportProgress.objects.filter(dump_set=dump_set).order_by(
+        'pk'
+    ).first() if dump_set else None
+    if first is not None:
+        return {
+            'post_offset': first.post_offset,
+            'comment_offset': first.comment_offset,
+        }
+    return {
+        'post_offset': max_pk(Post),
+        'comment_offset': max_pk(Comment),
+    }
+
+
+@contextmanager
+def keep_dates():
+    """Отключает auto_now_add, чтобы сохранить даты из дампа."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Загружает строки порциями по chunk_size, каждую в транзакции.
+
+    Пользователи и группы находятся по username и slug через словари
+    в памяти. Посты и комментарии получают id из дампа со сдвигом,
+    поэтому ссылки на них вычисляются без словарей. Сдвиг выбирается
+    при первом запуске первого файла набора dump_set, остальные файлы
+    набора получают тот же. Позиция сохраняется в ImportProgress
+    в той же транзакции, что и порция, и повторный запуск продолжает
+    с первой незагруженной строки.
+    """
+
+    def __init__(self, source, rows, chunk_size=None, batch_size=None,
+                 timelines=True, dump_set=''):
+        # rows при каждом запуске должны давать одни и те же строки.
+        self.rows = rows
+        self.chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.timelines = timelines
+        self.progress, _ = ImportProgress.objects.get_or_create(
+            source=source,
+            defaults={
+                'dump_set': dump_set,
+                'follow_start': max_pk(Follow) + 1,
+                **set_offsets(dump_set),
+            },
+        )
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+
+    def run(self, report=None):
+        if self.progress.finished:
+            return 0
+        rows = islice(self.rows, self.progress.position, None)
+        loaded = 0
+        with keep_dates():
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.load_chunk(chunk)
+                loaded += len(chunk)
+                if report is not None:
+                    report(self.progress.position)
+        self.finish()
+        return loaded
+
+    @transaction.atomic
+    def load_chunk(self, chunk):
+        by_type = defaultdict(list)
+        for number, row in enumerate(chunk, self.progress.position + 1):
+            if row.get('type') not in TYPES:
+                raise DumpError(f'Строка {number}: неизвестный type')
+            by_type[row['type']].append((number, row))
+        for row_type in TYPES:
+            if by_type[row_type]:
+                getattr(self, f'load_{row_type}s')(by_type[row_type])
+        self.progress.position += len(chunk)
+        self.progress.save(update_fields=['position'])
+
+    def bulk_create(self, model, objects):
+        objects = list(objects)
+        model.objects.bulk_create(
+            objects,
+            batch_size=bulk_batch_size(model, objects, self.batch_size),
+        )
+
+    def resolve(self, mapping, key, number, kind):
+        try:
+            return mapping[key]
+        except KeyError:
+            raise DumpError(f'Строка {number}: нет {kind} {key!r}')
+
+    def load_users(self, rows):
+        password = make_password(None)
+        new = {
+            row['username']: User(
+                username=row['username'],
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                password=password,
+            )
+            for number, row in rows
+            if row['username'] not in self.users
+        }
+        self.bulk_create(User, new.values())
+        self.users.update(
+            User.objects.filter(username__in=new).values_list(
+                'username', 'pk'
+            )
+        )
+
+    def load_groups(self, rows):
+        new = {
+            row['slug']: Group(
+                slug=row['slug'],
+                title=row.get('title') or row['slug'],
+                description=row.get('description') or '',
+            )
+            for number, row in rows
+            if row['slug'] not in self.groups
+        }
+        self.bulk_create(Group, new.values())
+        self.groups.update(
+            Group.objects.filter(slug__in=new).values_list('slug', 'pk')
+        )
+
+    def load_posts(self, rows):
+        offset = self.progress.post_offset
+        self.bulk_create(Post, [
+            Post(
+                id=offset + int(row['id']),
+                author_id=self.resolve(
+                    self.users, row['author'], number, 'автора'
+                ),
+                group_id=self.resolve(
+                    self.groups, row['group'], number, 'группы'
+                ) if row.get('group') else None,
+                text=row['text'],
+                pub_date=parse_datetime(row['pub_date']),
+                image=row.get('image') or '',
+            )
+            for number, row in rows
+        ])
+
+    def load_comments(self, rows):
+        self.bulk_create(Comment, [
+            Comment(
+                id=self.progress.comment_offset + int(row['id']),
+                post_id=self.progress.post_offset + int(row['post']),
+                author_id=self.resolve(
+                    self.users, row['author'], number, 'автора'
+                ),
+                text=row['text'],
+                created=parse_datetime(row['created']),
+            )
+            for number, row in rows
+        ])
+
+    def load_follows(self, rows):
+        self.bulk_create(Follow, [
+            Follow(
+                user_id=self.resolve(
+                    self.users, row['user'], number, 'пользователя'
+                ),
+                author_id=self.resolve(
+                    self.users, row['author'], number, 'автора'
+                ),
+            )
+            for number, row in rows
+        ])
+
+    def finish(self):
+        """Восстанавливает то, что при bulk_create делали сигналы.
+
+        Шаг повторяемый: если он прервётся, повторный запуск выполнит
+        его снова.
+        """
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Post, Comment]
+            ):
+                cursor.execute(sql)
+        counters.reconcile()
+        imported_posts = Post.objects.filter(
+            pk__gt=self.progress.post_offset
+        )
+        # Авторы новых постов и новых подписок — подзапросом, а не
+        # списком id: их может быть больше лимита параметров SQL.
+        authors = User.objects.filter(
+            Q(pk__in=imported_posts.values('author'))
+            | Q(pk__in=Follow.objects.filter(
+                pk__gte=self.progress.follow_start
+            ).values('author'))
+        )
+        timeline.mark_pulled()
+        if self.timelines:
+            backfill_timelines(list(authors.values_list('pk', flat=True)))
+        page_cache.bump(
+            'index',
+            *(f'profile:{username}' for username in authors.values_list(
+                'username', flat=True
+            ).iterator()),
+            *(f'group:{slug}' for slug in Group.objects.filter(
+                pk__in=imported_posts.values('group')
+            ).values_list('slug', flat=True)),
+        )
+        self.progress.finished = True
+        self.progress.save(update_fields=['finished'])
+
+
+def backfill_timelines(author_ids):
+    for author_id in author_ids:
+        follower_ids = list(
+            Follow.objects.filter(author_id=author_id).values_list(
+                'user_id', flat=True
+            )
+        )
+        if follower_ids and not timeline.is_pulled(author_id):
+            timeline.backfill(follower_ids, author_id)
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+# Записи, прочитанные заранее для текущей страницы
+_prefetched = ContextVar('thumbnail_prefetched', default=None)
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """KVStore sorl, который умеет читать записи пачкой.
+
+    Внутри prefetch() записи миниатюр страницы уже лежат в памяти, и тег
+    {% thumbnail %} не ходит за каждой в кэш и базу по отдельности.
+    """
+
+    def _get_raw(self, key):
+        prefetched = _prefetched.get()
+        if prefetched is not None and key in prefetched:
+            return prefetched[key]
+        return super()._get_raw(key)
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        prefetched = _prefetched.get()
+        if prefetched is not None:
+            prefetched[key] = value
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        prefetched = _prefetched.get()
+        if prefetched is not None:
+            for key in keys:
+                prefetched.pop(key, None)
+
+    def get_many_raw(self, keys):
+        """Читает записи одним get_many из кэша и одним запросом к базе."""
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(
+                KVStoreModel.objects.filter(key__in=missing).values_list(
+                    'key', 'value'
+                )
+            )
+            fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(fetched)
+        return {
+            key: None if value == EMPTY_VALUE else value
+            for key, value in values.items()
+        }
+
+
+def thumbnail_file(file_, geometry, **options):
+    """Файл миниатюры, который вернёт get_thumbnail, без обращения к нему.
+
+    Опции дополняются так же, как в ThumbnailBackend.get_thumbnail,
+    иначе имя и ключ миниатюры не совпадут.
+    """
+    backend = default.backend
+    source = ImageFile(file_)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+@contextmanager
+def prefetch(images):
+    """Заранее читает записи миниатюр THUMBNAIL_PRESETS для картинок."""
+    kvstore = default.kvstore
+    keys = [
+        add_prefix(thumbnail_file(image, geometry, **options).key)
+        for image in images if image
+        for geometry, options in settings.THUMBNAIL_PRESETS
+    ]
+    if not keys or not hasattr(kvstore, 'get_many_raw'):
+        yield
+        return
+    token = _prefetched.set(kvstore.get_many_raw(keys))
+    try:
+        yield
+    finally:
+        _prefetched.reset(token)
@@ -0,0 +1,61 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from posts import benchmark
+
+BASELINE = os.path.join(
+    os.path.dirname(benchmark.__file__), 'benchmark_baseline.json'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число запросов и пик памяти маршрутов '
+        'posts.urls на тестовой базе и сравнивает с базовой линией'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты как новую базовую линию',
+        )
+
+    def handle(self, *args, **options):
+        # Без DEBUG: отладочные шаблоны и лог запросов искажают замеры.
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            results = benchmark.run(options['iterations'])
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        for name, metrics in sorted(results.items()):
+            self.stdout.write(
+                f'{name:18} p50 {metrics["p50_ms"]:8.2f} ms  '
+                f'p95 {metrics["p95_ms"]:8.2f} ms  '
+                f'{metrics["queries"]:3} запросов  '
+                f'{metrics["peak_kb"]:6} КБ'
+            )
+        if options['update_baseline']:
+            benchmark.save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS('Базовая линия обновлена'))
+            return
+        regressions = benchmark.compare(
+            results, benchmark.load_baseline(options['baseline'])
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
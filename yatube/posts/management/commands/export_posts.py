@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, export_rows
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты и комментарии автора в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=sorted(FORMATS), default='ndjson'
+        )
+        parser.add_argument(
+            '--images', action='store_true',
+            help='Добавить к постам имена файлов картинок',
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; по умолчанию stdout'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        render_rows, _ = FORMATS[options['format']]
+        chunks = render_rows(export_rows(author, images=options['images']))
+        if options['output']:
+            # newline='' — переводы строк CSV пишет сам csv.writer.
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.dataset import generate_rows, make_images
+from posts.importer import Importer
+
+SIZES = {
+    'users': 1000,
+    'groups': 20,
+    'posts': 10000,
+    'comments': 20000,
+    'follows': 5000,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками; при одном --seed данные одинаковые'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        for name, default in SIZES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько разных картинок создать для постов',
+        )
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--no-timelines', action='store_true',
+            help='Не раскладывать посты по лентам подписчиков',
+        )
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name] for name in SIZES}
+        if sizes['users'] < 1 or min(sizes.values()) < 0:
+            raise CommandError('Нужен хотя бы один пользователь')
+        seed = options['seed']
+        images = make_images(options['images'], seed)
+        source = 'generate_dataset:' + ':'.join(
+            f'{name}={value}' for name, value in (
+                ('seed', seed), *sizes.items(), ('images', len(images))
+            )
+        )
+        importer = Importer(
+            source,
+            generate_rows(seed, images=images, **sizes),
+            options['chunk_size'],
+            options['batch_size'],
+            timelines=not options['no_timelines'],
+        )
+        loaded = importer.run(
+            report=lambda position: self.stdout.write(
+                f'{position}', ending='\r'
+            )
+        )
+        self.stdout.write(self.style.SUCCESS(f'Создано строк — {loaded}'))
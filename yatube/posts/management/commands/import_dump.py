@@ -0,0 +1,66 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.importer import DumpError, Importer, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает дампы пользователей, групп, постов, комментариев и '
+        'подписок в формате NDJSON или CSV; прерванная загрузка '
+        'продолжается с места остановки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', metavar='path')
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Строк в одной транзакции (IMPORT_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Строк в одном INSERT (IMPORT_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--dump-set',
+            help=(
+                'Набор дампов с общими id постов и комментариев '
+                '(по умолчанию — каталог файла)'
+            ),
+        )
+        parser.add_argument(
+            '--no-timelines', action='store_true',
+            help='Не раскладывать посты по лентам подписчиков',
+        )
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            importer = Importer(
+                os.path.abspath(path),
+                read_rows(path),
+                options['chunk_size'],
+                options['batch_size'],
+                timelines=not options['no_timelines'],
+                dump_set=options['dump_set'] or os.path.dirname(
+                    os.path.abspath(path)
+                ),
+            )
+            try:
+                loaded = importer.run(
+                    report=lambda position: self.stdout.write(
+                        f'{path}: {position}', ending='\r'
+                    )
+                )
+            except (DumpError, KeyError, ValueError) as error:
+                raise CommandError(f'{path}: {error!r}')
+            except IntegrityError as error:
+                # Порция откатилась целиком, позиция осталась прежней.
+                raise CommandError(
+                    f'{path}: строки противоречат базе ({error}); '
+                    'ссылки на посты из другого набора дампов?'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'{path}: загружено строк — {loaded}'
+            ))
@@ -0,0 +1,98 @@
+from django.db import migrations
+
+# SQL записан здесь, а не импортируется из posts.search: миграция
+# должна создавать ту схему, что была на момент её написания.
+INDEX_COLUMNS = """
+    SELECT
+        p.id,
+        p.text,
+        u.username || ' ' || u.first_name || ' ' || u.last_name,
+        COALESCE(g.title, '')
+    FROM posts_post p
+    JOIN auth_user u ON u.id = p.author_id
+    LEFT JOIN posts_group g ON g.id = p.group_id
+"""
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text, author, group_title,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER posts_post_fts_ai AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts (rowid, text, author, group_title)
+        {INDEX_COLUMNS} WHERE p.id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER posts_post_fts_au
+    AFTER UPDATE OF text, author_id, group_id ON posts_post BEGIN
+        DELETE FROM posts_post_fts WHERE rowid = old.id;
+        INSERT INTO posts_post_fts (rowid, text, author, group_title)
+        {INDEX_COLUMNS} WHERE p.id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_ad AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_post_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_user_au
+    AFTER UPDATE OF username, first_name, last_name ON auth_user BEGIN
+        UPDATE posts_post_fts
+        SET author = new.username || ' ' || new.first_name
+            || ' ' || new.last_name
+        WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_group_au
+    AFTER UPDATE OF title ON posts_group BEGIN
+        UPDATE posts_post_fts SET group_title = new.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    """,
+]
+
+BACKFILL_SQL = (
+    'INSERT INTO posts_post_fts (rowid, text, author, group_title) '
+    + INDEX_COLUMNS
+)
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_ai',
+    'DROP TRIGGER IF EXISTS posts_post_fts_au',
+    'DROP TRIGGER IF EXISTS posts_post_fts_ad',
+    'DROP TRIGGER IF EXISTS posts_post_fts_user_au',
+    'DROP TRIGGER IF EXISTS posts_post_fts_group_au',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+    schema_editor.execute(BACKFILL_SQL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
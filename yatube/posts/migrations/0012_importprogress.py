@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_imagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('post_offset', models.PositiveIntegerField()),
+                ('comment_offset', models.PositiveIntegerField()),
+                ('follow_start', models.PositiveIntegerField()),
+                ('finished', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_importprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importprogress',
+            name='dump_set',
+            field=models.CharField(default='', max_length=255),
+        ),
+    ]
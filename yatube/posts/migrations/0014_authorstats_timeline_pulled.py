@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 22:10
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def fill_timeline_pulled(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    # Решение принимается по таблице подписок, а не по счётчику.
+    followers = Subquery(
+        Follow.objects.filter(author=OuterRef('user')).order_by().values(
+            'author'
+        ).annotate(total=Count('pk')).values('total')
+    )
+    AuthorStats.objects.annotate(followers=followers).filter(
+        followers__gte=settings.TIMELINE_FANOUT_THRESHOLD
+    ).update(timeline_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_importprogress_dump_set'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='timeline_pulled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(
+            fill_timeline_pulled, migrations.RunPython.noop
+        ),
+    ]
@@ -1,19 +1,37 @@
+from django.core.files.storage import default_storage
 from django.db import models
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountersMixin:
+    """Не даёт save() затирать счётчики, которые меняются через F()."""
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CountersMixin, models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('posts_count',)
 
     def __str__(self):
         return f'{self.title}'
 
 
-class Post(models.Model):
+class Post(CountersMixin, models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
     author = models.ForeignKey(
@@ -33,13 +51,31 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('comments_count',)
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id']),
+            models.Index(fields=['author', '-pub_date', '-id']),
+            models.Index(fields=['group', '-pub_date', '-id']),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Версия входит в ключ кэша карточки поста (posts.cards).
+        editing = not self._state.adding
+        if editing:
+            self.version = models.F('version') + 1
+        super().save(*args, **kwargs)
+        if editing:
+            self.refresh_from_db(fields=['version'])
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -55,6 +91,12 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['post', 'created', 'id']),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -67,3 +109,84 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост в ленте подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post']),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Посты автора подмешиваются в ленты при чтении, а не раскладываются
+    # при публикации. Единственный источник этого решения для
+    # posts.timeline; меняется только при переходах с гистерезисом.
+    timeline_pulled = models.BooleanField(default=False)
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста для srcset."""
+    source = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['source', 'format', 'width']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'format', 'width'],
+                name='unique_image_variant'
+            ),
+        ]
+
+    @property
+    def url(self):
+        return default_storage.url(self.name)
+
+
+class ImportProgress(models.Model):
+    """Сколько строк дампа уже загружено командой import_dump."""
+    source = models.CharField(max_length=255, unique=True)
+    # Набор дампов, у файлов которого общие сдвиги id: комментарии из
+    # одного файла ссылаются на посты из другого
+    dump_set = models.CharField(max_length=255, default='')
+    position = models.PositiveIntegerField(default=0)
+    # Сдвиги, которые прибавляются к id постов и комментариев из дампа
+    post_offset = models.PositiveIntegerField()
+    comment_offset = models.PositiveIntegerField()
+    # Первый id подписки, загруженной из дампа
+    follow_start = models.PositiveIntegerField()
+    finished = models.BooleanField(default=False)
@@ -0,0 +1,155 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.cache import (
+    get_cache_key, learn_cache_key, patch_vary_headers
+)
+from django.views.decorators.http import condition
+
+from .models import Post, TimelineEntry
+
+
+def _generation_key(scope):
+    return f'listing_generation:{scope}'
+
+
+def _new_generation():
+    # Начинаем с текущего времени, а не с единицы: если ключ поколения
+    # вытеснят из кэша, старые страницы не совпадут с новым поколением.
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    keys = [_generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    missing = {
+        key: _new_generation() for key in keys if key not in generations
+    }
+    if missing:
+        cache.set_many(missing, None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+def bump(*scopes):
+    """Инвалидирует все закэшированные страницы перечисленных лент."""
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), None)
+
+
+def bump_scopes(scopes):
+    """bump() для списка областей — результата фоновой задачи."""
+    bump(*scopes)
+
+
+def cache_listing(get_scopes, get_posts=None):
+    """Кэширует страницу ленты до смены поколения её областей.
+
+    get_scopes получает аргументы view и возвращает имена областей
+    ('index', 'group:<slug>', 'profile:<username>'); сигналы моделей
+    вызывают bump() для затронутых областей, поэтому время жизни записи
+    может быть большим без риска показать устаревшую страницу.
+
+    С get_posts (посты ленты по аргументам view) страница получает
+    ETag, и клиент с актуальной копией получает 304 ещё до кэша.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(*args, **kwargs)
+            key_prefix = 'listing:' + ':'.join(
+                f'{scope}.{generation}' for scope, generation in zip(
+                    scopes, get_generations(scopes)
+                )
+            )
+            cache_key = get_cache_key(request, key_prefix, 'GET', cache)
+            if cache_key is not None:
+                response = cache.get(cache_key)
+                if response is not None:
+                    return response
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                # Шапка страницы зависит от пользователя.
+                patch_vary_headers(response, ('Cookie',))
+                timeout = settings.PAGE_CACHE_TIMEOUT
+                cache_key = learn_cache_key(
+                    request, response, timeout, key_prefix, cache
+                )
+                cache.set(cache_key, response, timeout)
+            return response
+        if get_posts is not None:
+            wrapper = condition(
+                etag_func=listing_etag(get_scopes, get_posts)
+            )(wrapper)
+        return wrapper
+    return decorator
+
+
+def make_etag(request, *parts):
+    """ETag страницы: части, пользователь и адрес с параметрами страницы.
+
+    Пользователь входит в ETag, потому что шапка страницы зависит от него.
+    """
+    user = request.user.pk if request.user.is_authenticated else ''
+    raw = ':'.join(map(str, (*parts, user, request.get_full_path())))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def listing_etag(get_scopes, get_posts):
+    """etag_func для condition(): поколения лент и дата новейшего поста.
+
+    Оба значения дешёвые — чтение кэша и MAX по индексу. Дата нужна на
+    случай записей в обход сигналов (bulk_create, update), которые не
+    меняют поколение. Last-Modified не отдаётся: правка поста не
+    сдвигает pub_date.
+    """
+    def etag(request, *args, **kwargs):
+        newest = get_posts(*args, **kwargs).aggregate(
+            newest=Max('pub_date')
+        )['newest']
+        return make_etag(
+            request, *get_generations(get_scopes(*args, **kwargs)), newest
+        )
+    return etag
+
+
+def follow_etag(request):
+    """ETag ленты подписок: новые посты, правки и смена подписок."""
+    if not request.user.is_authenticated:
+        return None
+    newest = TimelineEntry.objects.filter(user=request.user).aggregate(
+        newest=Max('pub_date')
+    )['newest']
+    return make_etag(
+        request,
+        *get_generations(['index', f'follow:{request.user.pk}']),
+        newest,
+    )
+
+
+def post_etag(request, post_id):
+    """ETag страницы поста: версия поста и время последнего комментария.
+
+    Число постов автора, название и адрес группы тоже выводятся на
+    странице, но не всегда меняют версию поста, поэтому входят в ETag
+    отдельно.
+    """
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Max('comments__created')
+    ).values_list(
+        'version', 'last_comment', 'author__stats__posts_count',
+        'group__title', 'group__slug',
+    ).first()
+    if row is None:
+        return None
+    return make_etag(request, *row)
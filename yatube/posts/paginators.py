@@ -0,0 +1,279 @@
+import heapq
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+FORWARD = 'n'
+BACKWARD = 'p'
+# Границы INTEGER в SQLite и BIGINT в остальных базах: число за ними
+# драйвер не передаст в запрос (OverflowError)
+MIN_INT = -2 ** 63
+MAX_INT = 2 ** 63 - 1
+
+
+def encode_cursor(direction, key, pk, number):
+    """Упаковывает позицию (key, id) в непрозрачный токен."""
+    payload = [direction, key, pk, number]
+    return urlsafe_base64_encode(force_bytes(json.dumps(payload)))
+
+
+def decode_cursor(token):
+    """Возвращает (direction, key, id, number) или None."""
+    try:
+        direction, key, pk, number = json.loads(
+            force_str(urlsafe_base64_decode(token))
+        )
+        pk, number = int(pk), int(number)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or not MIN_INT <= pk <= MAX_INT:
+        return None
+    return direction, key, pk, max(number, 1)
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id) без COUNT(*) и OFFSET.
+
+    Страница читается одним запросом LIMIT per_page + 1 от позиции
+    курсора, поэтому глубокие страницы стоят столько же, сколько первая.
+    Объект страницы — обычный Page, в шаблон дополнительно передаются
+    токены next_cursor и previous_cursor.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 date_attr='pub_date', descending=True, scope=None):
+        super().__init__(object_list, per_page)
+        # Поля, по которым строится ключ; значения курсора берутся из
+        # атрибутов date_attr и pk строки, поэтому ключ может лежать и в
+        # связанной денормализованной таблице (например, в ленте подписок).
+        self.date_key, self.id_key = keys
+        # Условие на связанную таблицу ключа (Q). Оно добавляется в тот же
+        # filter(), что и условие курсора: отдельные filter() по
+        # multi-valued связи дают отдельные JOIN, и курсор со
+        # ORDER BY считались бы по чужим строкам.
+        self.scope = scope if scope is not None else Q()
+        self.date_attr = date_attr
+        self.descending = descending
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def count(self):
+        # Точное число записей неизвестно и не нужно: отдаём нижнюю
+        # границу, достаточную для has_next/has_previous у Page.
+        return self.num_pages * self.per_page
+
+    @property
+    def num_pages(self):
+        return self._number + 1 if self._has_next else self._number
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def validate_number(self, number):
+        return number
+
+    def get_page(self, cursor):
+        return self.page(cursor)
+
+    def read_cursor(self, cursor):
+        """Возвращает (direction, key, id, number) с разобранным ключом.
+
+        None — токен испорчен или подделан.
+        """
+        position = decode_cursor(cursor)
+        if position is None:
+            return None
+        direction, key, pk, number = position
+        try:
+            key = self.decode_key(key)
+        except (TypeError, ValueError, OverflowError):
+            return None
+        if key is None:
+            return None
+        return direction, key, pk, number
+
+    def page(self, cursor):
+        position = self.read_cursor(cursor) if cursor else None
+        if position is None:
+            return self._first_page()
+        direction, date, pk, number = position
+        limit = self.per_page + 1
+        if direction == FORWARD:
+            rows = self.fetch((date, pk), True, limit)
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        else:
+            rows = self.fetch((date, pk), False, limit)
+            if len(rows) <= self.per_page:
+                # Дошли до начала ленты — первая страница всегда полная.
+                return self._first_page()
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        if not rows:
+            # Курсор указывает за конец выборки.
+            return self._first_page()
+        return self._build_page(rows, max(number, 2), has_next)
+
+    def sort_key(self, row):
+        return getattr(row, self.date_attr), row.pk
+
+    def encode_key(self, value):
+        return value.isoformat()
+
+    def decode_key(self, value):
+        return parse_datetime(value)
+
+    def fetch(self, after, forward, limit):
+        """Читает limit строк после позиции after.
+
+        forward=True — вглубь ленты, False — к её началу (в обратном
+        порядке); after=None — с самого начала ленты.
+        """
+        descending = forward == self.descending
+        condition = self.scope
+        if after is not None:
+            date, pk = after
+            lookup = 'lt' if descending else 'gt'
+            condition &= (
+                Q(**{f'{self.date_key}__{lookup}': date})
+                | Q(**{self.date_key: date})
+                & Q(**{f'{self.id_key}__{lookup}': pk})
+            )
+        queryset = self.object_list.filter(condition)
+        if descending:
+            queryset = queryset.order_by(
+                '-' + self.date_key, '-' + self.id_key
+            )
+        else:
+            queryset = queryset.order_by(self.date_key, self.id_key)
+        return list(queryset[:limit])
+
+    def _first_page(self):
+        rows = self.fetch(None, True, self.per_page + 1)
+        return self._build_page(
+            rows[:self.per_page], 1, len(rows) > self.per_page
+        )
+
+    def _build_page(self, rows, number, has_next):
+        self._number = number
+        self._has_next = has_next
+        page = Page(rows, number, self)
+        page.next_cursor = (
+            self._encode(FORWARD, rows[-1], number + 1) if has_next else None
+        )
+        page.previous_cursor = (
+            self._encode(BACKWARD, rows[0], number - 1) if number > 1 else None
+        )
+        return page
+
+    def _encode(self, direction, row, number):
+        key, pk = self.sort_key(row)
+        return encode_cursor(direction, self.encode_key(key), pk, number)
+
+
+class IdCursorPaginator(CursorPaginator):
+    """Курсорная пагинация только по первичному ключу."""
+
+    def __init__(self, object_list, per_page, descending=False):
+        # Порядок всё равно задаёт fetch(), но Paginator предупреждает
+        # (UnorderedObjectListWarning) о выборках без ordering.
+        super().__init__(
+            object_list.order_by('-id' if descending else 'id'), per_page,
+            keys=('id', 'id'), date_attr='pk', descending=descending,
+        )
+
+    def encode_key(self, value):
+        return value
+
+    def decode_key(self, value):
+        value = int(value)
+        if not MIN_INT <= value <= MAX_INT:
+            raise ValueError(value)
+        return value
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорная пагинация поверх нескольких упорядоченных источников.
+
+    Каждый источник — тройка (queryset, keys, scope) и читается
+    отдельным индексным запросом с LIMIT per_page + 1; результаты
+    сливаются k-way merge по (pub_date, id), повторы одного поста
+    отбрасываются.
+    """
+
+    def __init__(self, sources, per_page):
+        super().__init__(list(sources), per_page)
+        self.sources = [
+            CursorPaginator(queryset, per_page, keys, scope=scope)
+            for queryset, keys, scope in sources
+        ]
+
+    def fetch(self, after, forward, limit):
+        streams = [
+            source.fetch(after, forward, limit) for source in self.sources
+        ]
+        if len(streams) == 1:
+            return streams[0]
+        merged = heapq.merge(
+            *streams,
+            key=self.sort_key,
+            reverse=forward == self.descending,
+        )
+        rows, seen = [], set()
+        for post in merged:
+            if post.pk in seen:
+                continue
+            seen.add(post.pk)
+            rows.append(post)
+            if len(rows) == limit:
+                break
+        return rows
+
+
+def estimate_rows(queryset):
+    """Быстрая оценка числа строк таблицы без полного COUNT(*)."""
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] > 0 else None
+    # Для SQLite и остальных — максимальный первичный ключ: поиск по
+    # индексу, с точностью до удалённых строк.
+    return model._default_manager.using(queryset.db).aggregate(
+        total=Max('pk')
+    )['total'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор списков админки для больших таблиц.
+
+    Без фильтров число строк оценивается, с фильтрами считается не
+    дальше COUNT_LIMIT строк, так что страница не упирается в полный
+    COUNT(*) по миллионам записей.
+    """
+
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset)
+            if estimate is not None:
+                return estimate
+        return queryset[:self.COUNT_LIMIT].count()
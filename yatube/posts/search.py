@@ -0,0 +1,91 @@
+import re
+
+from django.db import connection
+
+from .models import Post
+from .paginators import CursorPaginator
+
+# Таблица FTS5 и триггеры, которые её обновляют, создаются миграцией
+# 0010_post_search_index.
+FTS_TABLE = 'posts_post_fts'
+
+INDEX_COLUMNS = """
+    SELECT
+        p.id,
+        p.text,
+        u.username || ' ' || u.first_name || ' ' || u.last_name,
+        COALESCE(g.title, '')
+    FROM posts_post p
+    JOIN auth_user u ON u.id = p.author_id
+    LEFT JOIN posts_group g ON g.id = p.group_id
+"""
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def rebuild():
+    """Заново наполняет поисковый индекс из таблицы постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text, author, group_title) '
+            + INDEX_COLUMNS
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+        )
+
+
+def to_match_query(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово ищется по префиксу, все слова должны встретиться.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная пагинация результатов FTS5 по (rank, id)."""
+
+    def __init__(self, match, per_page):
+        super().__init__(
+            Post.objects.select_related('author', 'group'),
+            per_page,
+            descending=False,
+        )
+        self.match = match
+
+    def sort_key(self, row):
+        return row.rank, row.pk
+
+    def encode_key(self, value):
+        return value
+
+    def decode_key(self, value):
+        return float(value)
+
+    def fetch(self, after, forward, limit):
+        ascending = forward
+        sql = f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = [self.match]
+        if after is not None:
+            op = '>' if ascending else '<'
+            sql += f' AND (rank {op} %s OR (rank = %s AND rowid {op} %s))'
+            rank, pk = after
+            params += [rank, rank, pk]
+        order = 'ASC' if ascending else 'DESC'
+        sql += f' ORDER BY rank {order}, rowid {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ranks = dict(cursor.fetchall())
+        posts = self.object_list.in_bulk(list(ranks))
+        rows = []
+        for pk, rank in ranks.items():
+            if pk in posts:
+                posts[pk].rank = rank
+                rows.append(posts[pk])
+        return rows
@@ -0,0 +1,191 @@
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from . import page_cache, timeline, uploads, workers
+from .counters import bump, bump_author
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=User)
+def remember_names(sender, instance, **kwargs):
+    instance._saved_names = (
+        instance.username, instance.first_name, instance.last_name
+    )
+
+
+@receiver(post_save, sender=User)
+def bump_author_posts_version(sender, instance, created, **kwargs):
+    names = (instance.username, instance.first_name, instance.last_name)
+    if not created and names != instance._saved_names:
+        # Имя автора выводится в карточках его постов.
+        Post.objects.filter(author=instance).update(version=F('version') + 1)
+        page_cache.bump(
+            'index',
+            f'profile:{instance._saved_names[0]}',
+            f'profile:{instance.username}',
+            *group_scopes(
+                Group.objects.filter(posts__author=instance).values('pk')
+            ),
+        )
+    instance._saved_names = names
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Отложенные поля не читаем: это лишний запрос на каждый объект.
+    deferred = instance.get_deferred_fields()
+    instance._saved_group_id = (
+        None if 'group_id' in deferred else instance.group_id
+    )
+    instance._saved_image = (
+        None if 'image' in deferred else instance.image.name
+    )
+
+
+@receiver(post_save, sender=Post)
+def process_new_image(sender, instance, **kwargs):
+    if instance.image and instance.image.name != instance._saved_image:
+        workers.submit_on_commit(
+            uploads.process, instance.image.name,
+            then=page_cache.bump_scopes,
+        )
+    instance._saved_image = instance.image.name
+
+
+def group_scopes(group_ids):
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+    return [f'group:{slug}' for slug in slugs]
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_listings(sender, instance, **kwargs):
+    group_ids = {instance.group_id, instance._saved_group_id} - {None}
+    page_cache.bump(
+        'index',
+        f'profile:{instance.author.username}',
+        *group_scopes(group_ids),
+    )
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_listings(sender, instance, **kwargs):
+    page_cache.bump(
+        'index',
+        f'profile:{instance.author.username}',
+        *group_scopes([instance.group_id]),
+    )
+
+
+@receiver(post_init, sender=Group)
+def remember_slug(sender, instance, **kwargs):
+    deferred = instance.get_deferred_fields()
+    instance._saved_group = (
+        None if {'slug', 'title'} & deferred
+        else (instance.slug, instance.title)
+    )
+
+
+def bump_group_posts_version(group):
+    # Название и адрес группы выводятся в карточках и на странице поста.
+    Post.objects.filter(group=group).update(version=F('version') + 1)
+    page_cache.bump('index', *(
+        f'profile:{username}' for username in User.objects.filter(
+            posts__group=group
+        ).distinct().values_list('username', flat=True)
+    ))
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_listing(sender, instance, created, **kwargs):
+    saved = instance._saved_group
+    # После смены slug страница по старому адресу тоже закэширована.
+    slugs = {instance.slug, saved[0] if saved else None} - {None}
+    page_cache.bump(*(f'group:{slug}' for slug in slugs))
+    if not created and saved != (instance.slug, instance.title):
+        bump_group_posts_version(instance)
+    instance._saved_group = (instance.slug, instance.title)
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group(sender, instance, **kwargs):
+    # После удаления у постов group = NULL и их уже не найти по группе.
+    bump_group_posts_version(instance)
+    page_cache.bump(f'group:{instance.slug}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_followed_profile(sender, instance, **kwargs):
+    # Кнопка подписки и счётчики на странице автора, лента подписчика.
+    page_cache.bump(
+        f'profile:{instance.author.username}', f'follow:{instance.user_id}'
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        bump_author(instance.author_id, posts_count=1)
+        bump(Group, instance.group_id, posts_count=1)
+    elif instance.group_id != instance._saved_group_id:
+        bump(Group, instance._saved_group_id, posts_count=-1)
+        bump(Group, instance.group_id, posts_count=1)
+    instance._saved_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    bump(AuthorStats, instance.author_id, posts_count=-1)
+    bump(Group, instance._saved_group_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        bump(Post, instance.post_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    bump(Post, instance.post_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        bump_author(instance.author_id, followers_count=1)
+        bump_author(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    bump(AuthorStats, instance.author_id, followers_count=-1)
+    bump(AuthorStats, instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def retract_timeline(sender, instance, **kwargs):
+    timeline.unfollow(instance.user_id, instance.author_id)
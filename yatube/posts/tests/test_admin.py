@@ -0,0 +1,59 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовый description',
+        )
+        for i in range(5):
+            author = User.objects.create_user(username=f'author{i}')
+            post = Post.objects.create(
+                text=f'Тестовый текст {i}', author=author, group=cls.group
+            )
+            Comment.objects.create(post=post, author=author, text='Текст')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelists_do_not_count_or_fetch_per_row(self):
+        for model in ('post', 'comment'):
+            url = reverse(f'admin:posts_{model}_changelist')
+            with self.subTest(model=model):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                sql = [query['sql'] for query in queries.captured_queries]
+                self.assertFalse(
+                    [q for q in sql if 'FROM "auth_user" WHERE' in q
+                     and '"auth_user"."id" = ' in q][1:],
+                    'Авторы строк должны загружаться одним запросом',
+                )
+                self.assertFalse(
+                    [q for q in sql if q.startswith('SELECT COUNT(*)')
+                     and 'LIMIT' not in q],
+                )
+
+    def test_post_search_uses_full_text_index(self):
+        url = reverse('admin:posts_post_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'q': 'текст 3'})
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Тестовый текст 3'],
+        )
+        self.assertTrue(
+            any('MATCH' in query['sql'] for query in queries.captured_queries)
+        )
@@ -0,0 +1,167 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+
+from .. import benchmark
+from ..dataset import generate_rows
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+ROWS = [
+    {'type': 'user', 'username': 'author', 'first_name': 'Лев'},
+    {'type': 'user', 'username': 'reader'},
+    {'type': 'group', 'slug': 'test-slug', 'title': 'Тестовая группа'},
+    {'type': 'post', 'id': 1, 'author': 'author', 'group': 'test-slug',
+     'pub_date': '2020-01-01T10:00:00+00:00', 'text': 'Первый пост'},
+    {'type': 'post', 'id': 2, 'author': 'author', 'group': None,
+     'pub_date': '2020-01-02T10:00:00+00:00', 'text': 'Второй пост'},
+    {'type': 'comment', 'id': 1, 'post': 2, 'author': 'reader',
+     'created': '2020-01-03T10:00:00+00:00', 'text': 'Комментарий'},
+    {'type': 'follow', 'user': 'reader', 'author': 'author'},
+]
+
+
+class ImportDumpTest(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.path = os.path.join(self.dir, 'dump.ndjson')
+        # Уже существующий пост сдвигает id загружаемых.
+        Post.objects.create(
+            text='Старый пост',
+            author=User.objects.create_user(username='old'),
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write(self, rows, path=None):
+        with open(path or self.path, 'w', encoding='utf-8') as dump:
+            for row in rows:
+                dump.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def import_dump(self, path=None):
+        call_command(
+            'import_dump', path or self.path, chunk_size=2,
+            stdout=io.StringIO(),
+        )
+
+    def assertImported(self):
+        author = User.objects.get(username='author')
+        self.assertEqual(
+            list(author.posts.order_by('pub_date').values_list(
+                'text', 'group__slug'
+            )),
+            [('Первый пост', 'test-slug'), ('Второй пост', None)],
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post.text, 'Второй пост')
+        self.assertEqual(comment.created.day, 3)
+        self.assertEqual(Follow.objects.count(), 1)
+        # Счётчики и ленты, которые обычно ведут сигналы.
+        author.stats.refresh_from_db()
+        self.assertEqual(author.stats.posts_count, 2)
+        self.assertEqual(author.stats.followers_count, 1)
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        self.assertEqual(comment.post.comments_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='reader').count(), 2
+        )
+
+    def test_import(self):
+        self.write(ROWS)
+        self.import_dump()
+        self.assertImported()
+
+    def test_import_resumes_after_failure(self):
+        broken = ROWS[:5] + [dict(ROWS[5], author='nobody')] + ROWS[6:]
+        self.write(broken)
+        with self.assertRaises(CommandError):
+            self.import_dump()
+        # Первые две порции загружены, третья откатилась целиком.
+        self.assertEqual(Post.objects.count(), 2)
+        self.write(ROWS)
+        self.import_dump()
+        self.assertImported()
+        self.import_dump()
+        self.assertEqual(Post.objects.count(), 3)
+
+    def test_files_of_one_dump_set_share_offsets(self):
+        comments = os.path.join(self.dir, 'comments.ndjson')
+        self.write(ROWS[:5])
+        self.write(ROWS[5:], comments)
+        self.import_dump()
+        self.import_dump(comments)
+        self.assertImported()
+
+    def test_conflicting_rows_are_reported(self):
+        again = os.path.join(self.dir, 'again.ndjson')
+        self.write(ROWS)
+        self.write(ROWS[3:4], again)
+        self.import_dump()
+        with self.assertRaises(CommandError):
+            self.import_dump(again)
+
+
+class GenerateDatasetTest(TestCase):
+    sizes = {
+        'users': 30, 'groups': 3, 'posts': 200, 'comments': 100,
+        'follows': 40,
+    }
+
+    def test_rows_are_deterministic(self):
+        self.assertEqual(
+            list(generate_rows(1, **self.sizes)),
+            list(generate_rows(1, **self.sizes)),
+        )
+        self.assertNotEqual(
+            list(generate_rows(1, **self.sizes)),
+            list(generate_rows(2, **self.sizes)),
+        )
+
+    def test_command_fills_database(self):
+        call_command(
+            'generate_dataset', seed=1, chunk_size=50, stdout=io.StringIO(),
+            **self.sizes
+        )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(Follow.objects.count(), 40)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        # Популярнее всех первый автор.
+        top = User.objects.order_by('-stats__posts_count').first()
+        self.assertEqual(top.username, 'user1')
+
+
+class BenchmarkTest(TestCase):
+    base = {'p50_ms': 10, 'p95_ms': 20, 'queries': 5, 'peak_kb': 100}
+
+    def test_every_route_is_measured(self):
+        data = {
+            'post': Post(pk=1), 'own_post': Post(pk=2),
+            'group': Group(slug='g'), 'author': User(username='a'),
+            'followed': User(username='b'),
+        }
+        self.assertEqual(
+            benchmark.missing_routes(benchmark.routes(data)), []
+        )
+        self.assertEqual(benchmark.missing_routes({}), sorted(
+            benchmark.routes(data)
+        ))
+
+    def test_compare(self):
+        baseline = {'index': self.base}
+        self.assertEqual(benchmark.compare({'index': self.base}, baseline), [])
+        # Шум во времени укладывается в допуск, лишний запрос — нет.
+        noisy = dict(self.base, p95_ms=30)
+        self.assertEqual(benchmark.compare({'index': noisy}, baseline), [])
+        regressed = dict(self.base, queries=6)
+        regressions = benchmark.compare({'index': regressed}, baseline)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('queries', regressions[0])
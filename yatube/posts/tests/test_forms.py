@@ -1,12 +1,25 @@
 import shutil
 import tempfile
+from concurrent.futures import Future
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from http import HTTPStatus
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
 
+from .. import page_cache, thumbnails, uploads, workers
+from ..cards import render_cards
 from ..models import Post, Group, User, Comment
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -165,3 +178,206 @@ class PostFormTests(TestCase):
         )
         self.assertEqual(Comment.objects.count(), comments_count)
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_WORKERS=0)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Nobody')
+        self.uploaded = SimpleUploadedFile(
+            name='thumbnail.gif',
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                b'\x0A\x00\x3B'
+            ),
+            content_type='image/gif'
+        )
+
+    @mock.patch('posts.workers.transaction.on_commit', lambda f: f())
+    @mock.patch('posts.workers.submit')
+    def test_only_new_images_are_queued(self, submit):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, image=self.uploaded
+        )
+        submit.assert_called_once_with(
+            uploads.process, post.image.name, then=page_cache.bump_scopes
+        )
+        post.text = 'Новый текст'
+        post.save()
+        submit.assert_called_once()
+
+    def test_generate_fills_thumbnail_store(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, image=self.uploaded
+        )
+        source = ImageFile(post.image.name)
+        self.assertFalse(
+            default.kvstore._get(source.key, identity='thumbnails')
+        )
+        thumbnails.generate(post.image.name)
+        self.assertEqual(
+            len(default.kvstore._get(source.key, identity='thumbnails')),
+            len(settings.THUMBNAIL_PRESETS),
+        )
+
+    def test_card_thumbnails_are_read_in_one_query(self):
+        content = self.uploaded.read()
+        posts = [
+            Post.objects.create(
+                text='Тестовый текст', author=self.user,
+                image=SimpleUploadedFile(f'card{i}.gif', content),
+            )
+            for i in range(3)
+        ]
+        for post in posts:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            render_cards(posts)
+        self.assertEqual(
+            len([q for q in queries if 'thumbnail_kvstore' in q['sql']]), 1
+        )
+
+    def test_generate_variants_records_srcset(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user,
+            image=SimpleUploadedFile('wide.jpg', make_jpeg((700, 300))),
+        )
+        variants = thumbnails.generate_variants(post.image.name)
+        self.assertEqual(
+            [(v.format, v.width) for v in variants],
+            [
+                (f, w) for f in thumbnails.variant_formats()
+                for w in (320, 480, 640)
+            ],
+        )
+        self.assertTrue(all(v.size > 0 for v in variants))
+        post.refresh_from_db()
+        self.assertEqual(post.version, 0)
+        self.assertEqual(
+            thumbnails.refresh_posts(post.image.name),
+            ['index', 'profile:Nobody'],
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.version, 1)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(
+            response, f'type="{thumbnails.MIME_TYPES[variants[0].format]}"'
+        )
+        self.assertContains(response, f'{variants[0].url} 320w')
+
+    def test_pool_result_is_finished_in_web_process(self):
+        generations = page_cache.get_generations(['index'])
+        future = Future()
+        future.set_result(['index'])
+        workers._done(page_cache.bump_scopes, future)
+        self.assertNotEqual(
+            page_cache.get_generations(['index']), generations
+        )
+
+
+def make_jpeg(size, orientation=None):
+    image = Image.new('RGB', size, 'white')
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    if orientation:
+        exif[0x0112] = orientation
+    content = BytesIO()
+    image.save(content, format='JPEG', exif=exif.tobytes())
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_WORKERS=0)
+class UploadLimitsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='Nobody')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, content):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Тестовый текст',
+            'image': SimpleUploadedFile(
+                'photo.jpg', content, content_type='image/jpeg'
+            ),
+        })
+
+    def test_upload_over_byte_limit_is_rejected(self):
+        content = make_jpeg((64, 64))
+        with self.settings(MAX_UPLOAD_SIZE=len(content) // 2):
+            response = self.create_post(content)
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, 'form', 'image',
+            uploads.TOO_LARGE.format(limit=0),
+        )
+
+    def test_upload_over_pixel_limit_is_rejected(self):
+        with self.settings(MAX_IMAGE_PIXELS=64 * 64 - 1):
+            response = self.create_post(make_jpeg((64, 64)))
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, 'form', 'image',
+            uploads.TOO_MANY_PIXELS.format(limit=0),
+        )
+
+    def test_normalize_downscales_and_strips_exif(self):
+        # Ориентация 6 — снимок повёрнут на 90°.
+        name = default_storage.save(
+            'posts/photo.jpg', ContentFile(make_jpeg((200, 100), 6))
+        )
+        with self.settings(IMAGE_MAX_SIDE=50):
+            self.assertEqual(uploads.normalize(name), name)
+        with default_storage.open(name) as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (25, 50))
+            self.assertNotIn('exif', image.info)
+
+    def test_normalize_keeps_quality_of_small_originals(self):
+        original = make_jpeg((200, 100))
+        name = default_storage.save('posts/photo.jpg', ContentFile(original))
+        self.assertEqual(uploads.normalize(name), name)
+        with default_storage.open(name) as file:
+            image = Image.open(file)
+            self.assertNotIn('exif', image.info)
+            self.assertEqual(
+                image.quantization, Image.open(BytesIO(original)).quantization
+            )
+        with default_storage.open(name) as file:
+            stripped = file.read()
+        self.assertIsNone(uploads.normalize(name))
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(), stripped)
+
+    def test_normalize_follows_renamed_file(self):
+        name = default_storage.save(
+            'posts/photo.jpg', ContentFile(make_jpeg((200, 100), 6))
+        )
+        post = Post.objects.create(text='Текст', author=self.user, image=name)
+        save = default_storage.save
+        with mock.patch.object(
+            default_storage, 'save',
+            lambda name, content: save('posts/other.jpg', content),
+        ):
+            saved = uploads.normalize(name)
+        self.assertNotEqual(saved, name)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, saved)
+        self.assertTrue(default_storage.exists(saved))
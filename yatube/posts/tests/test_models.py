@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -26,3 +29,89 @@ class PostModelTest(TestCase):
     def test_model_group_have_correct_object_names(self):
         group = PostModelTest.group
         self.assertEqual(group.title, str(group))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Nobody')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовый description',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Тестовый заголовок2',
+            slug='test-slug2',
+            description='Тестовый description2',
+        )
+
+    def assertCounters(self):
+        self.user.stats.refresh_from_db()
+        self.reader.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.group_2.refresh_from_db()
+        self.assertEqual(
+            self.user.stats.posts_count, self.user.posts.count()
+        )
+        self.assertEqual(
+            self.user.stats.followers_count, self.user.following.count()
+        )
+        self.assertEqual(
+            self.reader.stats.following_count, self.reader.follower.count()
+        )
+        self.assertEqual(self.group.posts_count, self.group.posts.count())
+        self.assertEqual(self.group_2.posts_count, self.group_2.posts.count())
+        for post in Post.objects.all():
+            self.assertEqual(post.comments_count, post.comments.count())
+
+    def test_counters_follow_changes(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertCounters()
+
+        post.group = self.group_2
+        post.save()
+        self.assertCounters()
+
+        follow.delete()
+        post.delete()
+        self.assertCounters()
+
+    def test_reconcile_repairs_drift(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.user)
+        Post.objects.update(comments_count=42)
+        Group.objects.update(posts_count=42)
+        AuthorStats.objects.update(
+            posts_count=42, followers_count=42, following_count=42
+        )
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertCounters()
+
+    def test_delete_after_bulk_update(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.user)
+        # Группа сменилась в обход сигналов: её счётчик отстал.
+        Post.objects.filter(pk=post.pk).update(group=self.group)
+        post.refresh_from_db()
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_delete_after_bulk_create(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.user)
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Текст'),
+        ])
+        post.delete()
+        self.assertFalse(Comment.objects.exists())
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertCounters()
@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import POSTS_NUMBER
+from ..models import Comment, Follow, Group, Post, User
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов страницы не зависит от количества постов на ней."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовый description',
+        )
+        self.author = User.objects.create_user(username='Nobody')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.post = self.create_post(self.author)
+
+    def create_post(self, author):
+        post = Post.objects.create(
+            text='Тестовый текст', author=author, group=self.group
+        )
+        Comment.objects.create(post=post, author=author, text='Текст')
+        return post
+
+    def fill_page(self):
+        """Добавляет посты и комментарии разных авторов до полной страницы."""
+        for i in range(POSTS_NUMBER):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            self.create_post(author)
+            Comment.objects.create(
+                post=self.post, author=author, text='Текст'
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_query_budget(self):
+        # Три запроса из бюджета — сессия, пользователь и ETag.
+        budgets = {
+            reverse('posts:index'): 4,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 5,
+            reverse('posts:profile', kwargs={'username': 'Nobody'}): 6,
+            reverse('posts:follow_index'): 5,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}): 5,
+        }
+        for filled in (False, True):
+            if filled:
+                self.fill_page()
+            for url, budget in budgets.items():
+                with self.subTest(url=url, filled=filled):
+                    self.assertLessEqual(self.count_queries(url), budget)
@@ -49,6 +49,12 @@ class StaticURLTests(TestCase):
         )
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    def test_post_comments(self):
+        response = self.guest_client.get(
+            f'/posts/{StaticURLTests.post.pk}/comments/'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
     def test_post_create_authorized_client(self):
         response = self.authorized_client.get('/create/')
         self.assertEqual(response.status_code, HTTPStatus.OK)
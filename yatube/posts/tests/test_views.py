@@ -1,10 +1,25 @@
-from django.test import Client, TestCase
+import csv
+import io
+import json
+from unittest import mock
+from http import HTTPStatus
+
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from yatube.settings import POSTS_NUMBER, NUMBER_OF_POSTS_CREATED
-from ..models import Post, Group, User, Comment, Follow
+from yatube.settings import (
+    COMMENTS_NUMBER, NUMBER_OF_POSTS_CREATED, POSTS_NUMBER
+)
+from ..checks import check_shared_cache
+from ..paginators import FORWARD, encode_cursor
+from ..models import (
+    AuthorStats, Post, Group, User, Comment, Follow, TimelineEntry
+)
 
 
 class PostViewsTests(TestCase):
@@ -242,6 +257,247 @@ class PaginatorViewsTest(TestCase):
         )
 
 
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Nobody')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовый description',
+        )
+        for i in range(NUMBER_OF_POSTS_CREATED):
+            Post.objects.create(
+                text='Тестовый текст' + str(i),
+                author=cls.user,
+                group=cls.group,
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cursor_pages_cover_feed_without_duplicates(self):
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.authorized_client.get(url).context['page_obj']
+                self.assertEqual(first.number, 1)
+                self.assertTrue(first.has_next())
+                self.assertIsNone(first.previous_cursor)
+                second = self.authorized_client.get(
+                    url + '?cursor=' + first.next_cursor
+                ).context['page_obj']
+                self.assertEqual(second.number, 2)
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    [post.id for post in first] + [post.id for post in second],
+                    expected,
+                )
+                back = self.authorized_client.get(
+                    url + '?cursor=' + second.previous_cursor
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.id for post in back], [post.id for post in first]
+                )
+
+    def test_cursor_page_does_not_count(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_broken_cursor_returns_first_page(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.authorized_client.get(url + '?cursor=garbage')
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), POSTS_NUMBER)
+
+    def test_out_of_range_cursor_returns_first_page(self):
+        cursor = encode_cursor(
+            FORWARD, '2020-01-01T00:00:00+00:00', 10 ** 30, 2
+        )
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response.context['page_obj'].number, 1)
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Nobody')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+        cls.other_post = Post.objects.create(text='Другой', author=cls.user)
+        cls.other_comment = Comment.objects.create(
+            text='Чужой комментарий', post=cls.other_post, author=cls.user
+        )
+        cls.comments = [
+            Comment.objects.create(
+                text=f'Комментарий {i}', post=cls.post, author=cls.user
+            )
+            for i in range(COMMENTS_NUMBER + 3)
+        ]
+
+    def test_post_detail_shows_first_batch_of_own_comments(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            list(comments), self.comments[:COMMENTS_NUMBER]
+        )
+        self.assertNotIn(self.other_comment, comments)
+        self.assertTrue(comments.has_next())
+
+    def test_comments_endpoint_returns_next_batch(self):
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': first.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(
+            list(response.context['comments']),
+            self.comments[COMMENTS_NUMBER:],
+        )
+        self.assertFalse(response.context['comments'].has_next())
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Nobody')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовый description',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+
+    def test_cached_cards_are_not_rendered_again(self):
+        self.client.get(self.url)
+        with mock.patch('posts.cards.render_to_string') as render:
+            response = self.client.get(self.url)
+        render.assert_not_called()
+        self.assertContains(response, self.post.text)
+
+    def test_edit_and_author_rename_invalidate_card(self):
+        self.client.get(self.url)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Новый текст')
+
+        self.user.first_name = 'Лев'
+        self.user.last_name = 'Толстой'
+        self.user.save()
+        self.assertContains(self.client.get(self.url), 'Лев Толстой')
+
+    def test_group_rename_invalidates_old_page_and_cards(self):
+        index = reverse('posts:index')
+        self.client.get(self.url)
+        self.client.get(index)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'new-slug'
+        group.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get(index)
+        self.assertContains(response, '/group/new-slug/')
+        self.assertNotContains(response, '/group/test-slug/')
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='tolstoy', first_name='Лев'
+        )
+        cls.group = Group.objects.create(
+            title='Классика',
+            slug='classic',
+            description='Тестовый description',
+        )
+        cls.post = Post.objects.create(
+            text='Все счастливые семьи похожи друг на друга',
+            author=cls.user,
+            group=cls.group,
+        )
+        cls.other_post = Post.objects.create(
+            text='Мой дядя самых честных правил',
+            author=User.objects.create_user(username='pushkin'),
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['page_obj']
+
+    def test_search_by_text_author_and_group(self):
+        for query in ('счастливые семьи', 'счаст', 'tolstoy', 'Классика'):
+            with self.subTest(query=query):
+                self.assertEqual(list(self.search(query)), [self.post])
+
+    def test_search_index_follows_changes(self):
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertEqual(list(self.search('счастливые')), [])
+        self.assertEqual(list(self.search('Новый')), [self.post])
+        self.group.title = 'Роман'
+        self.group.save()
+        self.assertEqual(list(self.search('Роман')), [self.post])
+        self.post.delete()
+        self.assertEqual(list(self.search('Новый')), [])
+
+    @mock.patch('posts.utils.POSTS_NUMBER', 1)
+    def test_search_results_are_paged_by_cursor(self):
+        post = Post.objects.create(text='Честных людей мало', author=self.user)
+        first = self.search('честных')
+        self.assertTrue(first.has_next())
+        second = self.search('честных', cursor=first.next_cursor)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            {*first, *second}, {self.other_post, post}
+        )
+
+    def test_garbage_query_is_safe(self):
+        response = self.client.get(reverse('posts:search'), {'q': '"*) OR'})
+        self.assertEqual(response.status_code, 200)
+
+
 class СacheTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -265,22 +521,109 @@ class СacheTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
+    def test_shared_cache_is_required_for_deploy(self):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ['posts.E001']
+        )
+        shared = {'default': {
+            'BACKEND': 'core.cache.InstrumentedCache',
+            'WRAPPED_BACKEND':
+                'django.core.cache.backends.memcached.MemcachedCache',
+        }}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
     def test_cache(self):
+        cache.clear()
         response_before = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.create(
+        with CaptureQueriesContext(connection) as queries:
+            response_cached = self.authorized_client.get(
+                reverse('posts:index')
+            )
+        self.assertEqual(response_before.content, response_cached.content)
+        # Посты не читаются, кроме MAX(pub_date) по индексу для ETag.
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT MAX('):
+                self.assertNotIn('posts_post', query['sql'])
+
+        post = Post.objects.create(
             text='Кештекст',
             author=self.user,
             group=self.group
         )
-        response_after = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_before.content, response_after.content)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Кештекст')
 
-        cache.clear()
+        post.delete()
         response = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(response_before.content, response.content)
+        self.assertNotContains(response, 'Кештекст')
+
+    def assertNotModified(self, url, etag):
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def assertModified(self, url, etag):
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response['ETag']
+
+    def test_conditional_get(self):
+        Follow.objects.create(user=self.user_not_author, author=self.user)
+        self.authorized_client.force_login(self.user_not_author)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:follow_index'),
+        )
+        etags = {url: self.assertModified(url, '') for url in urls}
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertNotModified(url, etag)
+        Post.objects.create(text='Новый пост', author=self.user,
+                            group=self.group)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertModified(url, etag)
+
+    def test_post_detail_conditional_get(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.assertModified(url, '')
+        self.assertNotModified(url, etag)
+        Comment.objects.create(
+            text='Новый комментарий', post=self.post, author=self.user
+        )
+        etag = self.assertModified(url, etag)
+        self.post.text = 'Исправленный текст'
+        self.post.save()
+        etag = self.assertModified(url, etag)
+        # Массовое переименование минует сигналы и версию поста.
+        Group.objects.filter(pk=self.group.pk).update(slug='new-slug')
+        etag = self.assertModified(url, etag)
+        Group.objects.filter(pk=self.group.pk).update(title='Новое название')
+        self.assertModified(url, etag)
+
+    def test_post_invalidates_group_and_profile(self):
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        Post.objects.create(
+            text='Кештекст',
+            author=self.user,
+            group=self.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Кештекст')
 
 
 class FollowTest(TestCase):
@@ -353,3 +696,207 @@ class FollowTest(TestCase):
         self.authorized_client.force_login(any_user)
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'].object_list)
+
+    def test_unfollow_retracts_author_posts(self):
+        follow = Follow.objects.create(
+            user=self.user,
+            author=self.user_not_author,
+        )
+        post = Post.objects.create(author=self.user_not_author, text='qwerty')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        follow.delete()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(post, response.context['page_obj'].object_list)
+
+    def test_follow_backfills_existing_posts(self):
+        post = Post.objects.create(author=self.user_not_author, text='qwerty')
+        Follow.objects.create(user=self.user, author=self.user_not_author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'].object_list)
+
+    @override_settings(TIMELINE_LENGTH=3)
+    def test_timeline_is_trimmed(self):
+        Follow.objects.create(user=self.user, author=self.user_not_author)
+        posts = [
+            Post.objects.create(author=self.user_not_author, text=str(i))
+            for i in range(5)
+        ]
+        entries = TimelineEntry.objects.filter(user=self.user)
+        self.assertEqual(entries.count(), 3)
+        self.assertEqual(
+            set(entries.values_list('post_id', flat=True)),
+            {post.id for post in posts[-3:]},
+        )
+
+    @override_settings(TIMELINE_LENGTH=3)
+    def test_fan_out_queries_do_not_depend_on_followers(self):
+        counts = []
+        for followers in (1, 10):
+            author = User.objects.create_user(username=f'author{followers}')
+            for i in range(followers):
+                reader = User.objects.create_user(
+                    username=f'reader{followers}_{i}'
+                )
+                Follow.objects.create(user=reader, author=author)
+            for i in range(3):
+                Post.objects.create(author=author, text=str(i))
+            with CaptureQueriesContext(connection) as queries:
+                post = Post.objects.create(author=author, text='new')
+            counts.append(len(queries))
+            self.assertEqual(
+                TimelineEntry.objects.filter(post__author=author).count(),
+                3 * followers,
+            )
+            self.assertEqual(
+                TimelineEntry.objects.filter(post=post).count(), followers
+            )
+        self.assertEqual(counts[0], counts[1])
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+    def test_popular_author_posts_are_pulled_and_merged(self):
+        star = User.objects.create_user(username='star')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=self.user, author=star)
+        Follow.objects.create(user=fan, author=star)
+        Follow.objects.create(user=self.user, author=self.user_not_author)
+        posts = [
+            Post.objects.create(author=star, text='star'),
+            Post.objects.create(author=self.user_not_author, text='push'),
+            Post.objects.create(author=star, text='star'),
+        ]
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=star).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj'].object_list), posts[::-1]
+        )
+
+    @override_settings(
+        TIMELINE_FANOUT_THRESHOLD=3, TIMELINE_FANOUT_HYSTERESIS=1,
+        IMAGE_WORKERS=0,
+    )
+    @mock.patch('posts.workers.transaction.on_commit', lambda f: f())
+    def test_author_returns_to_push_below_hysteresis_band(self):
+        star = User.objects.create_user(username='star')
+        fans = [
+            User.objects.create_user(username=f'fan{i}') for i in range(2)
+        ]
+        for user in (self.user, *fans):
+            Follow.objects.create(user=user, author=star)
+        posts = [Post.objects.create(author=star, text=str(i)) for i in '12']
+        own_entries = TimelineEntry.objects.filter(
+            user=self.user, post__author=star
+        )
+        Follow.objects.get(user=fans[0], author=star).delete()
+        self.assertTrue(
+            AuthorStats.objects.get(user=star).timeline_pulled
+        )
+        self.assertFalse(own_entries.exists())
+        Follow.objects.get(user=fans[1], author=star).delete()
+        self.assertEqual(
+            set(own_entries.values_list('post_id', flat=True)),
+            {post.id for post in posts},
+        )
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+    def test_drifted_counter_does_not_hide_posts(self):
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=self.user, author=self.user_not_author)
+        Follow.objects.create(user=fan, author=self.user_not_author)
+        AuthorStats.objects.filter(user=self.user_not_author).update(
+            followers_count=0
+        )
+        post = Post.objects.create(author=self.user_not_author, text='new')
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'].object_list)
+
+    def test_next_pages_with_several_followers(self):
+        for number in range(3):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'reader{number}'),
+                author=self.user_not_author,
+            )
+        Follow.objects.create(user=self.user, author=self.user_not_author)
+        for number in range(POSTS_NUMBER * 2 + 5):
+            Post.objects.create(author=self.user_not_author, text=str(number))
+        expected = list(
+            Post.objects.filter(author=self.user_not_author).order_by(
+                '-pub_date', '-id'
+            )
+        )
+        shown, cursor = [], None
+        # Предел страниц: при повторах курсор может зациклиться.
+        for _ in range(len(expected)):
+            response = self.authorized_client.get(
+                reverse('posts:follow_index'),
+                {'cursor': cursor} if cursor else {},
+            )
+            page = response.context['page_obj']
+            shown.extend(page.object_list)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(shown, expected)
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Nobody')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовый description',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.author, group=cls.group
+        )
+        Post.objects.create(text='Текст без группы', author=cls.author)
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Свой комментарий'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Чужой комментарий'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.author)
+        self.url = reverse(
+            'posts:profile_export', kwargs={'username': 'Nobody'}
+        )
+
+    def test_ndjson_export(self):
+        response = self.client.get(self.url, {'images': 1})
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [(row['type'], row['text']) for row in rows],
+            [('post', 'Тестовый текст'), ('post', 'Текст без группы'),
+             ('comment', 'Свой комментарий')],
+        )
+        self.assertEqual(rows[0]['group'], 'test-slug')
+        self.assertIsNone(rows[0]['image'])
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[2]['post'], str(self.post.pk))
+
+    def test_only_author_can_export(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_export_command(self):
+        output = io.StringIO()
+        call_command('export_posts', 'Nobody', stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 3)
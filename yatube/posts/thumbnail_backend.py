@@ -0,0 +1,17 @@
+from sorl.thumbnail.base import ThumbnailBackend
+
+from core import tracing
+
+
+class TracedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl с интервалом трассы на каждую миниатюру.
+
+    Через него проходят и тег {% thumbnail %}, и get_thumbnail.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        with tracing.span('thumbnail', **{
+            'thumbnail.file': str(file_),
+            'thumbnail.geometry': geometry_string,
+        }):
+            return super().get_thumbnail(file_, geometry_string, **options)
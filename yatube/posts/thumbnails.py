@@ -0,0 +1,126 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+
+# Тип для <source>: браузер берёт первый формат, который понимает
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+def generate(name):
+    """Создаёт все миниатюры из THUMBNAIL_PRESETS для файла name.
+
+    sorl сохраняет результат в своё key-value хранилище, поэтому тег
+    {% thumbnail %} в шаблонах найдёт готовую миниатюру и не будет
+    создавать её в запросе.
+    """
+    from sorl.thumbnail import get_thumbnail
+
+    for geometry, options in settings.THUMBNAIL_PRESETS:
+        get_thumbnail(name, geometry, **options)
+
+
+def variant_formats():
+    """Форматы из IMAGE_VARIANT_FORMATS, которые умеет сохранять Pillow.
+
+    WebP доступен, только если Pillow собран с libwebp.
+    """
+    Image.init()
+    return [
+        image_format for image_format in settings.IMAGE_VARIANT_FORMATS
+        if image_format in Image.SAVE
+    ]
+
+
+def variant_widths(width):
+    """Ширины из IMAGE_VARIANT_WIDTHS, не больше ширины оригинала."""
+    widths = [w for w in settings.IMAGE_VARIANT_WIDTHS if w <= width]
+    return widths or settings.IMAGE_VARIANT_WIDTHS[:1]
+
+
+def generate_variants(name):
+    """Создаёт копии картинки по ширинам и форматам и записывает их.
+
+    Кадрирование то же, что у первой миниатюры из THUMBNAIL_PRESETS,
+    поэтому все копии взаимозаменяемы в одном srcset.
+    """
+    from sorl.thumbnail import get_thumbnail
+
+    from .models import ImageVariant
+
+    geometry, options = settings.THUMBNAIL_PRESETS[0]
+    crop_width, crop_height = map(int, geometry.split('x'))
+    with default_storage.open(name) as file:
+        width = Image.open(file).size[0]
+    variants = []
+    for image_format in variant_formats():
+        for variant_width in variant_widths(width):
+            height = round(variant_width * crop_height / crop_width)
+            thumbnail = get_thumbnail(
+                name, f'{variant_width}x{height}',
+                **options, format=image_format,
+            )
+            variants.append(ImageVariant(
+                source=name,
+                name=thumbnail.name,
+                format=image_format,
+                width=thumbnail.width,
+                height=thumbnail.height,
+                size=thumbnail.storage.size(thumbnail.name),
+            ))
+    with transaction.atomic():
+        ImageVariant.objects.filter(source=name).delete()
+        ImageVariant.objects.bulk_create(variants)
+    return variants
+
+
+def refresh_posts(name):
+    """Поднимает версию постов с картинкой name после её обработки.
+
+    Новая версия сбрасывает карточки, где картинка была показана без
+    srcset. Возвращает области лент с этими постами: в воркере пула
+    сигналы сбросили бы только его собственный кэш, поэтому области
+    сбрасывает page_cache.bump_scopes уже в веб-процессе.
+    """
+    from .models import Post
+
+    posts = Post.objects.filter(image=name).select_related('author', 'group')
+    scopes = {'index'}
+    with transaction.atomic():
+        for post in posts:
+            post.save(update_fields=['version'])
+            scopes.add(f'profile:{post.author.username}')
+            if post.group_id:
+                scopes.add(f'group:{post.group.slug}')
+    return sorted(scopes)
+
+
+def attach_variants(posts):
+    """Добавляет постам image_sources и image_fallback одним запросом."""
+    from .models import ImageVariant
+
+    posts = [post for post in posts if post.image]
+    if not posts:
+        return
+    variants = defaultdict(lambda: defaultdict(list))
+    for variant in ImageVariant.objects.filter(
+        source__in={post.image.name for post in posts}
+    ):
+        variants[variant.source][variant.format].append(variant)
+    for post in posts:
+        formats = variants.get(post.image.name, {})
+        post.image_sources = [
+            {
+                'type': MIME_TYPES[image_format],
+                'srcset': ', '.join(
+                    f'{variant.url} {variant.width}w'
+                    for variant in formats[image_format]
+                ),
+            }
+            for image_format in settings.IMAGE_VARIANT_FORMATS
+            if formats.get(image_format)
+        ]
+        fallback = formats.get('JPEG')
+        post.image_fallback = fallback[-1] if fallback else None
@@ -0,0 +1,190 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from . import workers
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .utils import bulk_batch_size
+
+# Вторичный ключ — id самого поста: он равен post_id записи ленты, а
+# сортировка по timeline_entries__post шла бы по Meta.ordering поста.
+TIMELINE_KEYS = ('timeline_entries__pub_date', 'id')
+POST_KEYS = ('pub_date', 'id')
+
+
+def is_pulled(author_id):
+    """Посты автора читаются при запросе, а не раскладываются по лентам."""
+    return AuthorStats.objects.filter(
+        user_id=author_id, timeline_pulled=True
+    ).exists()
+
+
+def _mode(author_id):
+    """(followers_count, timeline_pulled) автора."""
+    return AuthorStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', 'timeline_pulled'
+    ).first() or (0, False)
+
+
+def _push_limit():
+    # Ниже этого числа подписчиков автор возвращается на раскладку.
+    # Полоса между ним и порогом не даёт автору на границе порога
+    # переключаться при каждой подписке и отписке.
+    return (
+        settings.TIMELINE_FANOUT_THRESHOLD
+        - settings.TIMELINE_FANOUT_HYSTERESIS
+    )
+
+
+def trim(user_ids):
+    """Обрезает ленты пользователей до TIMELINE_LENGTH записей.
+
+    Один DELETE на всех: номер записи в ленте считает ROW_NUMBER() по
+    индексу (user, -pub_date, -post). user_ids — список или подзапрос.
+    """
+    ranked = TimelineEntry.objects.filter(user_id__in=user_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('pub_date').desc(), F('post_id').desc()],
+        )
+    ).values('id', 'position')
+    sql, params = ranked.query.sql_with_params()
+    table = TimelineEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM ({sql}) ranked WHERE position > %s)',
+            [*params, settings.TIMELINE_LENGTH],
+        )
+
+
+@transaction.atomic
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+    trim(followers)
+
+
+@transaction.atomic
+def backfill(user_ids, author_id):
+    """Добавляет в ленты последние посты автора.
+
+    user_ids — список или подзапрос values_list('user_id', flat=True).
+    """
+    posts = list(
+        Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', 'pub_date')[:settings.TIMELINE_LENGTH]
+    )
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in user_ids
+        for post_id, pub_date in posts
+    ]
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=bulk_batch_size(TimelineEntry, entries, 1000),
+        ignore_conflicts=True,
+    )
+    trim(user_ids)
+
+
+def follow(user_id, author_id):
+    followers_count, pulled = _mode(author_id)
+    if pulled:
+        return
+    if followers_count >= settings.TIMELINE_FANOUT_THRESHOLD:
+        # Переход на чтение ничего не перестраивает: записи автора в
+        # лентах вытеснятся новыми, а повторы отбрасывает
+        # MergedCursorPaginator.
+        AuthorStats.objects.filter(user_id=author_id).update(
+            timeline_pulled=True
+        )
+        return
+    backfill([user_id], author_id)
+
+
+def unfollow(user_id, author_id):
+    """Убирает из ленты посты автора после отписки.
+
+    Если автор опустился ниже полосы гистерезиса, его посты раскладываются
+    по лентам оставшихся подписчиков — в пуле воркеров, а не в запросе.
+    """
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+    followers_count, pulled = _mode(author_id)
+    if pulled and followers_count < _push_limit():
+        workers.submit_on_commit(switch_to_push, author_id)
+
+
+@transaction.atomic
+def switch_to_push(author_id):
+    """Возвращает автора на раскладку: заполняет ленты его подписчиков.
+
+    До конца заполнения автор остаётся на чтении, поэтому его посты не
+    пропадают из лент; повторный вызов ничего не делает.
+    """
+    stats = AuthorStats.objects.select_for_update().filter(
+        user_id=author_id, timeline_pulled=True
+    ).first()
+    if stats is None or stats.followers_count >= _push_limit():
+        return
+    backfill(
+        Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        ),
+        author_id,
+    )
+    stats.timeline_pulled = False
+    stats.save(update_fields=['timeline_pulled'])
+
+
+def mark_pulled():
+    """Переводит на чтение авторов, набравших порог подписчиков.
+
+    Для массовой загрузки подписок, минуя сигналы; счётчики должны быть
+    пересчитаны заранее.
+    """
+    AuthorStats.objects.filter(
+        timeline_pulled=False,
+        followers_count__gte=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).update(timeline_pulled=True)
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются при запросе."""
+    return Follow.objects.filter(
+        user=user, author__stats__timeline_pulled=True
+    ).values_list('author', flat=True)
+
+
+def feed_queryset(user):
+    """Лента подписок одним запросом — для старых ссылок ?page=N."""
+    return Post.objects.select_related('author', 'group').filter(
+        Q(timeline_entries__user=user) | Q(author__in=pulled_authors(user))
+    ).distinct()
+
+
+def feed_sources(user):
+    """Источники ленты подписок для MergedCursorPaginator."""
+    posts = Post.objects.select_related('author', 'group')
+    sources = [
+        (posts, TIMELINE_KEYS, Q(timeline_entries__user=user)),
+    ]
+    for author_id in pulled_authors(user):
+        sources.append((posts.filter(author_id=author_id), POST_KEYS, None))
+    return sources
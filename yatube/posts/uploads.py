@@ -0,0 +1,122 @@
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+from . import thumbnails
+
+# Тег EXIF с ориентацией снимка
+ORIENTATION = 0x0112
+
+TOO_LARGE = 'Файл слишком большой: не больше {limit} МБ.'
+TOO_MANY_PIXELS = 'Картинка слишком большая: не больше {limit} Мпикс.'
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку на диск по частям и обрывает её на MAX_UPLOAD_SIZE.
+
+    Файл целиком в память не попадает. Слишком большой файл дальше
+    лимита не пишется: форма получает пустой файл с пометкой too_large
+    и показывает понятную ошибку.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.MAX_UPLOAD_SIZE:
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.too_large = self.received > settings.MAX_UPLOAD_SIZE
+        return file
+
+
+def check_size(file):
+    """Проверяет размер файла и число пикселей по заголовку картинки.
+
+    Django уже открыл картинку без декодирования (file.image), так что
+    размеры берутся из заголовка, а пиксели не распаковываются.
+    """
+    if file.size > settings.MAX_UPLOAD_SIZE:
+        raise forms.ValidationError(TOO_LARGE.format(
+            limit=settings.MAX_UPLOAD_SIZE // 2 ** 20
+        ))
+    image = getattr(file, 'image', None)
+    if image is not None:
+        width, height = image.size
+        if width * height > settings.MAX_IMAGE_PIXELS:
+            raise forms.ValidationError(TOO_MANY_PIXELS.format(
+                limit=settings.MAX_IMAGE_PIXELS // 10 ** 6
+            ))
+
+
+def normalize(name):
+    """Уменьшает оригинал до IMAGE_MAX_SIDE и убирает из него EXIF.
+
+    Поворот из EXIF применяется к пикселям до удаления метаданных.
+    Для JPEG draft() декодирует сразу в уменьшенном масштабе, поэтому
+    большая фотография не распаковывается в память целиком. Если менять
+    нечего, файл не трогается; если нужно только убрать EXIF, JPEG
+    пересохраняется с таблицами квантования оригинала.
+
+    Возвращает имя переписанного файла или None, если файл не изменён.
+    """
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        if getattr(image, 'is_animated', False):
+            return None
+        image_format = image.format
+        limit = settings.IMAGE_MAX_SIDE
+        rotated = image.getexif().get(ORIENTATION, 1) != 1
+        oversized = max(image.size) > limit
+        options = {}
+        if oversized or rotated:
+            image.draft(image.mode, (limit, limit))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((limit, limit))
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+        elif 'exif' not in image.info:
+            return None
+        elif image_format == 'JPEG':
+            # Пиксели не меняются: не пережимаем с качеством по умолчанию.
+            options = {'quality': 'keep', 'subsampling': 'keep'}
+        content = BytesIO()
+        # Без параметра exif Pillow метаданные не сохраняет.
+        image.save(content, format=image_format, **options)
+    default_storage.delete(name)
+    saved = default_storage.save(name, ContentFile(content.getvalue()))
+    if saved != name:
+        # Хранилище выбрало другое имя: иначе посты ссылались бы на
+        # удалённый файл.
+        from .models import Post
+
+        Post.objects.filter(image=name).update(image=saved)
+    return saved
+
+
+def process(name):
+    """Обработка новой картинки поста в фоновом процессе.
+
+    Возвращает области лент с постами этой картинки для
+    page_cache.bump_scopes, который выполняется уже в веб-процессе.
+    """
+    from sorl.thumbnail import delete
+
+    normalized = normalize(name)
+    if normalized is not None:
+        # Оригинал переписан: сбрасываем данные sorl о нём.
+        delete(name, delete_file=False)
+        name = normalized
+    thumbnails.generate(name)
+    thumbnails.generate_variants(name)
+    return thumbnails.refresh_posts(name)
@@ -0,0 +1,66 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from yatube.settings import COMMENTS_NUMBER, POSTS_NUMBER
+
+from . import search
+from .models import Post
+from .paginators import CursorPaginator, MergedCursorPaginator
+
+
+def get_page_obj(request, queryset, sources=None):
+    """Возвращает страницу ленты для шаблона posts/includes/paginator.html.
+
+    По умолчанию используется курсорная пагинация (?cursor=...);
+    старые ссылки вида ?page=N продолжают работать через OFFSET.
+    Если переданы sources, страница собирается слиянием нескольких
+    источников (см. MergedCursorPaginator).
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return Paginator(queryset, POSTS_NUMBER).get_page(page_number)
+    if sources is not None:
+        paginator = MergedCursorPaginator(sources, POSTS_NUMBER)
+    else:
+        paginator = CursorPaginator(queryset, POSTS_NUMBER)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def get_comments_page(request, post):
+    """Комментарии поста от старых к новым, порциями по курсору."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_NUMBER,
+        keys=('created', 'id'),
+        date_attr='created',
+        descending=False,
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def get_search_page(request, query):
+    """Страница результатов поиска по тексту, автору и группе поста."""
+    match = search.to_match_query(query)
+    if not match:
+        return None
+    if search.is_supported():
+        paginator = search.SearchPaginator(match, POSTS_NUMBER)
+    else:
+        paginator = CursorPaginator(
+            Post.objects.select_related('author', 'group').filter(
+                text__icontains=query
+            ),
+            POSTS_NUMBER,
+        )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def bulk_batch_size(model, objects, limit, using='default'):
+    """batch_size для bulk_create не больше limit и лимитов базы.
+
+    Django 2.2 не урезает явный batch_size под ограничения базы (у SQLite
+    это число параметров и термов в INSERT ... SELECT).
+    """
+    database_limit = connections[using].ops.bulk_batch_size(
+        model._meta.concrete_fields, objects
+    )
+    return max(min(limit, database_limit), 1)
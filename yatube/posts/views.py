@@ -1,31 +1,35 @@
-from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
-from yatube.settings import POSTS_NUMBER
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, StreamingHttpResponse
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 
-from .models import Post, Group, User, Comment, Follow
+from .models import Post, Group, User, Follow
 from .forms import PostForm, CommentForm
+from . import export, thumbnails, timeline
+from .page_cache import cache_listing, follow_etag, post_etag
+from .utils import get_comments_page, get_page_obj, get_search_page
 
 
-@cache_page(20)
+@cache_listing(lambda: ['index'], lambda: Post.objects)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POSTS_NUMBER)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = get_page_obj(request, post_list)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_listing(
+    lambda slug: [f'group:{slug}'],
+    lambda slug: Post.objects.filter(group__slug=slug),
+)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group).all()
-    paginator = Paginator(post_list, POSTS_NUMBER)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = get_page_obj(request, post_list)
     context = {
         'page_obj': page_obj,
         'group': group,
@@ -33,12 +37,17 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_listing(
+    lambda username: [f'profile:{username}'],
+    lambda username: Post.objects.filter(author__username=username),
+)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post = author.posts.all()
-    paginator = Paginator(post, POSTS_NUMBER)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+    )
+    post_list = author.posts.select_related('author', 'group')
+    page_obj = get_page_obj(request, post_list)
     context = {
         'author': author,
         'page_obj': page_obj,
@@ -51,13 +60,28 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': get_search_page(request, query),
+        'cursor_params': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id,
+    )
     form = CommentForm(request.POST or None)
     if form.is_valid():
         form.save()
         return redirect('posts:post_detail', post.pk)
-    comments = Comment.objects.all()
+    comments = get_comments_page(request, post)
+    thumbnails.attach_variants([post])
     context = {
         'post': post,
         'form': form,
@@ -66,6 +90,15 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -117,18 +150,39 @@ def add_comment(request, post_id):
 
 
 @login_required
+@condition(etag_func=follow_etag)
 def follow_index(request):
-    user = request.user
-    post_list = Post.objects.filter(author__following__user=user)
-    paginator = Paginator(post_list, POSTS_NUMBER)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = timeline.feed_queryset(request.user)
+    page_obj = get_page_obj(
+        request,
+        post_list,
+        sources=timeline.feed_sources(request.user),
+    )
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user and not request.user.is_staff:
+        raise PermissionDenied
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in export.FORMATS:
+        raise Http404
+    render_rows, content_type = export.FORMATS[export_format]
+    rows = export.export_rows(author, images='images' in request.GET)
+    response = StreamingHttpResponse(
+        render_rows(rows), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{export_format}"'
+    )
+    return response
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
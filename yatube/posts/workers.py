@@ -0,0 +1,72 @@
+import atexit
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+
+
+def _init_worker():
+    # Соединения с БД, унаследованные от родителя при fork, закрываем:
+    # воркер откроет собственные.
+    connections.close_all()
+
+
+def _shutdown():
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+
+
+def get_executor():
+    """Пул процессов для фоновых задач, свой у каждого процесса."""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            initializer=_init_worker,
+        )
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _done(then, future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Фоновая задача не удалась: %s', error)
+        return
+    if then is None:
+        return
+    try:
+        then(future.result())
+    except Exception:
+        logger.exception('Завершение фоновой задачи не удалось')
+
+
+def submit(func, *args, then=None):
+    """Выполняет func в пуле процессов; при IMAGE_WORKERS = 0 — сразу.
+
+    then получает результат func и выполняется в этом процессе, а не
+    в воркере: инвалидацию кэша нужно делать здесь, иначе при локальном
+    кэше она останется в воркере. then вызывается в служебном потоке
+    пула и к базе не обращается — запись в неё остаётся за func.
+    """
+    if not settings.IMAGE_WORKERS:
+        result = func(*args)
+        return then(result) if then is not None else result
+    get_executor().submit(func, *args).add_done_callback(
+        partial(_done, then)
+    )
+
+
+def submit_on_commit(func, *args, then=None):
+    transaction.on_commit(lambda: submit(func, *args, then=then))
+
+
+atexit.register(_shutdown)
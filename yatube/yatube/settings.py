@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -50,11 +51,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,7 +67,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,6 +78,7 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
             ],
+            'builtins': ['core.templatetags.tracing'],
         },
     },
 ]
@@ -83,8 +87,21 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 POSTS_NUMBER: int = 10
 
+COMMENTS_NUMBER: int = 20
+
 NUMBER_OF_POSTS_CREATED: int = 13
 
+# Сколько последних постов хранится в материализованной ленте подписок
+TIMELINE_LENGTH: int = 1000
+
+# Посты авторов, у которых подписчиков не меньше порога, не раскладываются
+# по лентам при публикации, а подмешиваются в ленту при чтении
+TIMELINE_FANOUT_THRESHOLD: int = 5000
+
+# Обратно на раскладку автор переходит, только когда подписчиков стало
+# меньше порога на эту величину; ленты подписчиков заполняет пул воркеров
+TIMELINE_FANOUT_HYSTERESIS: int = 500
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -155,8 +172,129 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кто передаёт медиафайлы клиенту: None — сам Django (через sendfile
+# сервера, если он есть), 'X-Sendfile' — Apache/lighttpd,
+# 'X-Accel-Redirect' — nginx с internal-локацией по префиксу ниже
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Для разработки хватает локального кэша; в боевом окружении с
+# несколькими процессами нужен общий (проверка posts.E001 в check --deploy)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.InstrumentedCache',
+        'WRAPPED_BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Сколько строк выгрузка постов и комментариев читает из базы за раз
+EXPORT_CHUNK_SIZE: int = 2000
+
+# Загрузка дампов: строк в одной транзакции и в одном INSERT
+IMPORT_CHUNK_SIZE: int = 20000
+IMPORT_BATCH_SIZE: int = 2000
+
+# Наибольший размер страницы JSON API (?limit=)
+API_MAX_LIMIT: int = 100
+
+# Карточки постов кэшируются по версии поста, поэтому живут долго
+POST_CARD_CACHE_TIMEOUT: int = 60 * 60 * 24
+
+# Страницы лент сбрасываются сигналами, а не по таймеру
+PAGE_CACHE_TIMEOUT: int = 60 * 60
+
+# Миниатюры, которые создаются в фоне при загрузке картинки поста.
+# Геометрия и опции должны совпадать с тегами {% thumbnail %} в шаблонах,
+# иначе sorl не найдёт готовую миниатюру и создаст её в запросе.
+THUMBNAIL_PRESETS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+# Хранилище sorl, которое читает записи миниатюр страницы одной пачкой
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
+# Бэкенд sorl, который отмечает миниатюры в трассе запроса
+THUMBNAIL_BACKEND = 'posts.thumbnail_backend.TracedThumbnailBackend'
+
+# Копии картинки поста для srcset: ширины в пикселях и форматы в порядке
+# предпочтения. JPEG нужен как запасной вариант для <img>.
+IMAGE_VARIANT_WIDTHS = (320, 480, 640, 960, 1280)
+IMAGE_VARIANT_FORMATS = ('WEBP', 'JPEG')
+
+# Число процессов для фоновых задач: обработки картинок (уменьшение
+# оригинала, удаление EXIF, миниатюры) и заполнения лент подписок при
+# возврате автора на раскладку; 0 — выполнять сразу в запросе
+IMAGE_WORKERS: int = 2
+
+# Загрузки пишутся на диск по частям, а не собираются в памяти
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedUploadHandler']
+
+# Лимиты на загружаемую картинку: размер файла и число пикселей
+# проверяются до декодирования, больший оригинал уменьшается в фоне
+MAX_UPLOAD_SIZE: int = 20 * 2 ** 20
+MAX_IMAGE_PIXELS: int = 50 * 10 ** 6
+IMAGE_MAX_SIDE: int = 2560
+
+# Метрики запросов (/metrics) выключены, пока не заданы оба параметра.
+# Prometheus передаёт токен в заголовке Authorization: Bearer <токен>
+# (authorization или bearer_token в scrape_config). Адрес клиента не
+# проверяется: за обратным прокси REMOTE_ADDR — это адрес прокси.
+METRICS_ENABLED = False
+METRICS_TOKEN = None
+
+# Границы корзин гистограммы времени ответа, в секундах
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Каталог, через который воркеры обмениваются метриками (по файлу на
+# процесс), и как часто процесс обновляет свой файл, в секундах.
+# None — /metrics показывает только процесс, ответивший на запрос.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL: int = 10
+
+# Профили запросов (cProfile): куда сохранять, сколько последних хранить,
+# сколько действует подписанный заголовок X-Profile (manage.py
+# profile_token) и доля случайных запросов: один из N, 0 — выключено
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILE_KEEP: int = 200
+PROFILE_TOKEN_MAX_AGE: int = 60 * 60
+PROFILE_SAMPLE_EVERY: int = 0
+
+# Трассировка запросов (core.tracing): доля трассируемых запросов от 0
+# до 1, файл, куда трассы дописываются в JSON-кодировке OTLP, и предел
+# числа интервалов в одной трассе
+TRACE_SAMPLE_RATE: float = 0.0
+TRACE_FILE = os.path.join(BASE_DIR, 'traces.ndjson')
+TRACE_MAX_SPANS: int = 2000
+
+# Журнал медленных запросов (core.slow_queries): порог в миллисекундах
+# (None — выключен), как часто один и тот же текст запроса может попасть
+# в журнал, в секундах, и файл журнала с ротацией
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_INTERVAL: int = 60
+SLOW_QUERY_LOG_FILE = os.path.join(BASE_DIR, 'slow_queries.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'slow_queries': {'format': '%(asctime)s %(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'maxBytes': 10 * 2 ** 20,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'slow_queries',
+        },
+    },
+    'loggers': {
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}